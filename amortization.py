@@ -0,0 +1,682 @@
+"""
+    Local amortization engine that reproduces the bankrate debt pay down
+    plan in-process. Every month each debt accrues interest, receives its
+    minimum payment and whatever is left of the monthly budget (the sum of
+    all original minimum payments, the budget savings and any windfall for
+    that month) is rolled onto the debts in strategy order.
+"""
+import json
+import logging
+import math
+from datetime import date
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from models import Loan, Windfall, month_of, parse_month
+
+
+LOG = logging.getLogger(__name__)
+
+MAX_MONTHS = 600
+PAID_OFF = 0.005
+
+
+class DebtTerms(NamedTuple):
+    """Numeric terms of a single debt, rates are APR in percent"""
+
+    lender_name: str
+    balance: float
+    rate: float
+    min_payment: float
+    promo_rate: float
+    promo_min_payment: float
+    promo_end: int
+    deductible: bool
+
+    def rate_for(self, month: int) -> float:
+        return self.promo_rate if month <= self.promo_end else self.rate
+
+    def min_payment_for(self, month: int) -> float:
+        return self.promo_min_payment if month <= self.promo_end else self.min_payment
+
+
+class ScheduleRow(NamedTuple):
+    month: int
+    date: date
+    payments: tuple
+    interest: tuple
+    balances: tuple
+
+
+class DebtOutcome(NamedTuple):
+    lender_name: str
+    payoff_month: Optional[int]
+    payoff_date: Optional[date]
+    total_interest: float
+    total_paid: float
+
+
+def parse_amount(value) -> float:
+    """Turn config strings like "3,018.36" or "$4,000" into floats"""
+    if value in (None, ""):
+        return 0.0
+    return float(str(value).replace(",", "").replace("$", "").strip())
+
+
+def month_index(start: date, when: str) -> int:
+    """
+        Month number of a "%m/%d/%Y" date relative to the plan start,
+        the month the plan starts in is month 1.
+    """
+    return parse_month(when) - month_of(start) + 1
+
+
+def month_date(start: date, month: int) -> date:
+    """First day of the calendar month for a plan month number"""
+    offset = start.month - 1 + month - 1
+    return date(start.year + offset // 12, offset % 12 + 1, 1)
+
+
+def debt_terms(loan: Loan, start: date) -> DebtTerms:
+    """Build the numeric terms for a Loan from the config"""
+    promo = loan.promo_details
+    min_payment = loan.min_payment_cents / 100
+    return DebtTerms(
+        lender_name=loan.lender_name,
+        balance=loan.balance_cents / 100,
+        rate=loan.regular_rate_bp / 100,
+        min_payment=min_payment,
+        promo_rate=(promo.promo_rate_bp if promo else loan.rate_bp) / 100,
+        promo_min_payment=(
+            promo.minimum_monthly_payment_cents / 100 if promo else min_payment
+        ),
+        promo_end=promo.end_month - month_of(start) + 1 if promo else 0,
+        deductible=loan.tax_deductible,
+    )
+
+
+def windfall_months(windfalls: Iterable[Windfall], start: date) -> Dict[int, float]:
+    """Map of plan month to windfall cash, windfalls in the past are dropped"""
+    months = {}
+    for windfall in windfalls:
+        month = windfall.month - month_of(start) + 1
+        if month >= 1:
+            months[month] = months.get(month, 0.0) + windfall.amount_cents / 100
+    return months
+
+
+def effective_rate(terms: DebtTerms, month: int, tax_rate: float) -> float:
+    """After tax rate of a debt for the given month"""
+    rate = terms.rate_for(month)
+    return rate * (1 - tax_rate) if terms.deductible else rate
+
+
+def avalanche(month: int, balances: List[float], terms: List[DebtTerms], tax_rate):
+    """Highest after tax rate first, smaller balance breaks ties"""
+    return sorted(
+        range(len(terms)),
+        key=lambda i: (-effective_rate(terms[i], month, tax_rate), balances[i]),
+    )
+
+
+def snowball(month: int, balances: List[float], terms: List[DebtTerms], tax_rate):
+    """Smallest balance first"""
+    return sorted(range(len(terms)), key=lambda i: balances[i])
+
+
+STRATEGIES = {"avalanche": avalanche, "snowball": snowball}
+
+
+class PayDownPlan:
+    """
+        Result of a local simulation: the month-by-month schedule
+        and the outcome of every debt
+    """
+
+    def __init__(
+        self,
+        start: date,
+        terms: List[DebtTerms],
+        schedule: List[ScheduleRow],
+        payoff_months: List[Optional[int]],
+        interest: List[float],
+        paid: List[float],
+        tax_rate: float,
+    ):
+        self.start = start
+        self.terms = terms
+        self.schedule = schedule
+        self.tax_rate = tax_rate
+        self.outcomes = [
+            DebtOutcome(
+                lender_name=debt.lender_name,
+                payoff_month=month,
+                payoff_date=month_date(start, month) if month else None,
+                total_interest=round(interest[i], 2),
+                total_paid=round(paid[i], 2),
+            )
+            for i, (debt, month) in enumerate(zip(terms, payoff_months))
+        ]
+
+    @property
+    def total_interest(self) -> float:
+        return round(sum(outcome.total_interest for outcome in self.outcomes), 2)
+
+    @property
+    def after_tax_interest(self) -> float:
+        return round(
+            sum(
+                o.total_interest * (1 - self.tax_rate if t.deductible else 1)
+                for o, t in zip(self.outcomes, self.terms)
+            ),
+            2,
+        )
+
+    @property
+    def paid_off(self) -> bool:
+        return all(outcome.payoff_month is not None for outcome in self.outcomes)
+
+    @property
+    def debt_free_month(self) -> Optional[int]:
+        if self.paid_off:
+            return max([o.payoff_month for o in self.outcomes], default=0)
+
+    @property
+    def debt_free_date(self) -> Optional[date]:
+        month = self.debt_free_month
+        if month:
+            return month_date(self.start, month)
+
+    def to_dict(self) -> dict:
+        return {
+            "start": self.start.isoformat(),
+            "debt_free_date": (
+                self.debt_free_date.isoformat() if self.debt_free_date else None
+            ),
+            "months": self.debt_free_month,
+            "total_interest": self.total_interest,
+            "after_tax_interest": self.after_tax_interest,
+            "debts": [
+                {
+                    "lender_name": o.lender_name,
+                    "payoff_date": o.payoff_date.isoformat() if o.payoff_date else None,
+                    "months": o.payoff_month,
+                    "total_interest": o.total_interest,
+                    "total_paid": o.total_paid,
+                }
+                for o in self.outcomes
+            ],
+            "schedule": [
+                {
+                    "month": row.month,
+                    "date": row.date.isoformat(),
+                    "payments": [round(p, 2) for p in row.payments],
+                    "interest": [round(i, 2) for i in row.interest],
+                    "balances": [round(b, 2) for b in row.balances],
+                }
+                for row in self.schedule
+            ],
+        }
+
+
+def pay_month(
+    month: int,
+    balances: List[float],
+    terms: List[DebtTerms],
+    cash: float,
+    strategy: Callable,
+    tax_rate: float,
+):
+    """
+        Advance the balances in place by one month and
+        return the payments and interest for that month
+    """
+    count = len(terms)
+    payments = [0.0] * count
+    interest = [0.0] * count
+    for i in range(count):
+        if balances[i] > PAID_OFF:
+            interest[i] = balances[i] * terms[i].rate_for(month) / 1200
+            balances[i] += interest[i]
+    for i in range(count):
+        if balances[i] > PAID_OFF:
+            payment = min(balances[i], terms[i].min_payment_for(month), cash)
+            balances[i] -= payment
+            payments[i] += payment
+            cash -= payment
+    for i in strategy(month, balances, terms, tax_rate):
+        if cash <= 0:
+            break
+        if balances[i] > PAID_OFF:
+            payment = min(balances[i], cash)
+            balances[i] -= payment
+            payments[i] += payment
+            cash -= payment
+    return payments, interest
+
+
+class Portfolio(NamedTuple):
+    """Everything a simulation needs, parsed from a config"""
+
+    start: date
+    terms: List[DebtTerms]
+    windfalls: Dict[int, float]
+    budget: float
+    tax_rate: float
+
+
+def portfolio(
+    loans: Iterable, windfalls: Iterable = (), user_info: dict = None, start=None
+) -> Portfolio:
+    """
+        Parse Loans, Windfalls and the user config (tax_bracket,
+        budget_savings) into numbers, the monthly budget is every
+        minimum payment plus the budget savings
+    """
+    user_info = user_info or {}
+    start = (start or date.today()).replace(day=1)
+    terms = [debt_terms(loan, start) for loan in loans]
+    return Portfolio(
+        start=start,
+        terms=terms,
+        windfalls=windfall_months(windfalls, start),
+        budget=sum(t.min_payment for t in terms)
+        + parse_amount(user_info.get("budget_savings")),
+        tax_rate=parse_amount(user_info.get("tax_bracket")) / 100,
+    )
+
+
+class _Totals:
+    """Running per debt totals and the schedule of a simulation"""
+
+    def __init__(self, parsed: Portfolio):
+        self.parsed = parsed
+        self.balances = [t.balance for t in parsed.terms]
+        self.payoff_months = [None if b > PAID_OFF else 0 for b in self.balances]
+        self.interest = [0.0] * len(parsed.terms)
+        self.paid = [0.0] * len(parsed.terms)
+        self.schedule = []
+
+    @property
+    def done(self) -> bool:
+        return all(b <= PAID_OFF for b in self.balances)
+
+    def record(self, month: int, payments: List[float], interest: List[float]):
+        for i, balance in enumerate(self.balances):
+            self.interest[i] += interest[i]
+            self.paid[i] += payments[i]
+            if self.payoff_months[i] is None and balance <= PAID_OFF:
+                self.payoff_months[i] = month
+        self.schedule.append(
+            ScheduleRow(
+                month=month,
+                date=month_date(self.parsed.start, month),
+                payments=tuple(payments),
+                interest=tuple(interest),
+                balances=tuple(self.balances),
+            )
+        )
+
+    def step(self, month: int, strategy: Callable):
+        """One month with the full pay_month rules"""
+        payments, interest = pay_month(
+            month,
+            self.balances,
+            self.parsed.terms,
+            self.parsed.budget + self.parsed.windfalls.get(month, 0.0),
+            strategy,
+            self.parsed.tax_rate,
+        )
+        self.record(month, payments, interest)
+
+    def plan(self) -> PayDownPlan:
+        return PayDownPlan(
+            self.parsed.start,
+            self.parsed.terms,
+            self.schedule,
+            self.payoff_months,
+            self.interest,
+            self.paid,
+            self.parsed.tax_rate,
+        )
+
+
+def simulate(
+    loans: Iterable,
+    windfalls: Iterable = (),
+    user_info: dict = None,
+    start: date = None,
+    strategy="avalanche",
+    max_months: int = MAX_MONTHS,
+) -> PayDownPlan:
+    """
+        Simulate the pay down plan for Loans, Windfalls and the user
+        config (tax_bracket, budget_savings) month by month.
+
+        :param strategy: name in STRATEGIES or a callable with the same
+                         signature returning the order extra cash is applied
+    """
+    strategy = STRATEGIES[strategy] if isinstance(strategy, str) else strategy
+    totals = _Totals(portfolio(loans, windfalls, user_info, start))
+    for month in range(1, max_months + 1):
+        if totals.done:
+            break
+        totals.step(month, strategy)
+    else:
+        LOG.warning(f"Debts not paid off within {max_months} months")
+    return totals.plan()
+
+
+AMENDABLE = (
+    "balance",
+    "rate",
+    "min_payment",
+    "promo_rate",
+    "promo_min_payment",
+    "promo_end",
+)
+
+
+class Checkpoint(NamedTuple):
+    """State at the end of a month, enough to resume the simulation"""
+
+    month: int
+    terms: tuple
+    balances: tuple
+    payoff_months: tuple
+    interest: tuple
+    paid: tuple
+    schedule_length: int
+
+
+class IncrementalPlan:
+    """
+        Month by month plan that can be edited without starting over.
+        The state is checkpointed every `every` months and each edit
+        records the first month it can affect: a windfall its month, a
+        budget change or a loan amendment the month it takes effect.
+        recalculate() resumes from the last checkpoint before the
+        earliest such month, so a late edit only reruns the tail.
+    """
+
+    def __init__(
+        self,
+        parsed: Portfolio,
+        strategy="avalanche",
+        max_months: int = MAX_MONTHS,
+        every: int = 12,
+    ):
+        self.parsed = parsed
+        self.strategy = STRATEGIES[strategy] if isinstance(strategy, str) else strategy
+        self.max_months = max_months
+        self.every = every
+        self.windfalls = dict(parsed.windfalls)
+        minimums = sum(terms.min_payment for terms in parsed.terms)
+        self.savings = {1: parsed.budget - minimums}
+        self.amendments: Dict[int, Dict[int, dict]] = {}
+        self.checkpoints: List[Checkpoint] = []
+        self.totals = _Totals(parsed)
+        self.terms = list(parsed.terms)
+        self.dirty: Optional[int] = 1
+        self.months_run = 0
+        self.recalculate()
+
+    @classmethod
+    def from_config(
+        cls, loans: Iterable, windfalls: Iterable = (), user_info: dict = None, **kw
+    ) -> "IncrementalPlan":
+        start = kw.pop("start", None)
+        return cls(portfolio(loans, windfalls, user_info, start), **kw)
+
+    def _touch(self, month: int):
+        self.dirty = max(1, month if self.dirty is None else min(self.dirty, month))
+
+    def set_windfall(self, month: int, amount: float):
+        """Windfall cash in a plan month, 0 removes it"""
+        if amount:
+            self.windfalls[month] = amount
+        else:
+            self.windfalls.pop(month, None)
+        self._touch(month)
+
+    def set_budget_savings(self, amount: float, from_month: int = 1):
+        """Budget savings from a plan month on, on top of the minimums"""
+        self.savings[from_month] = amount
+        self._touch(from_month)
+
+    def amend(self, index: int, month: int = 1, **changes):
+        """
+            Change a debt from a plan month on, e.g. a new statement
+            balance or rate. balance replaces the simulated balance at
+            the start of that month, the other AMENDABLE fields replace
+            the debt's terms. A new min_payment raises or lowers the
+            monthly budget with it, as editing the config would.
+        """
+        unknown = set(changes) - set(AMENDABLE)
+        if unknown:
+            raise ValueError(f"Can't amend {', '.join(sorted(unknown))}")
+        self.amendments.setdefault(month, {}).setdefault(index, {}).update(changes)
+        self._touch(month)
+
+    def budget(self, month: int) -> float:
+        """Minimums of the terms in force (amended or not) plus the savings"""
+        savings = self.savings[max(m for m in self.savings if m <= month)]
+        return sum(terms.min_payment for terms in self.terms) + savings
+
+    def _checkpoint(self, month: int):
+        totals = self.totals
+        self.checkpoints.append(
+            Checkpoint(
+                month,
+                tuple(self.terms),
+                tuple(totals.balances),
+                tuple(totals.payoff_months),
+                tuple(totals.interest),
+                tuple(totals.paid),
+                len(totals.schedule),
+            )
+        )
+
+    def _restore(self, before: int):
+        """Go back to the last checkpoint at or before month `before`"""
+        while self.checkpoints and self.checkpoints[-1].month > before:
+            self.checkpoints.pop()
+        if not self.checkpoints:
+            self.totals = _Totals(self.parsed)
+            self.terms = list(self.parsed.terms)
+            self._checkpoint(0)
+            return 0
+        point = self.checkpoints[-1]
+        totals = self.totals
+        self.terms = list(point.terms)
+        totals.balances = list(point.balances)
+        totals.payoff_months = list(point.payoff_months)
+        totals.interest = list(point.interest)
+        totals.paid = list(point.paid)
+        del totals.schedule[point.schedule_length :]
+        return point.month
+
+    def _amend(self, month: int):
+        for index, changes in self.amendments.get(month, {}).items():
+            terms = {k: v for k, v in changes.items() if k != "balance"}
+            if terms:
+                self.terms[index] = self.terms[index]._replace(**terms)
+            if "balance" in changes:
+                balance = changes["balance"]
+                self.totals.balances[index] = balance
+                self.totals.payoff_months[index] = (
+                    None if balance > PAID_OFF else month - 1
+                )
+
+    def recalculate(self) -> PayDownPlan:
+        """Rerun the months the edits since the last call can affect"""
+        if self.dirty is not None:
+            month = self._restore(self.dirty - 1)
+            totals = self.totals
+            last_amendment = max(self.amendments, default=0)
+            self.months_run = 0
+            while month < self.max_months:
+                if totals.done and month >= last_amendment:
+                    break
+                month += 1
+                self._amend(month)
+                payments, interest = pay_month(
+                    month,
+                    totals.balances,
+                    self.terms,
+                    self.budget(month) + self.windfalls.get(month, 0.0),
+                    self.strategy,
+                    self.parsed.tax_rate,
+                )
+                totals.record(month, payments, interest)
+                self.months_run += 1
+                if month % self.every == 0:
+                    self._checkpoint(month)
+            if not totals.done:
+                LOG.warning(f"Debts not paid off within {self.max_months} months")
+            self.dirty = None
+        return self.plan
+
+    @property
+    def plan(self) -> PayDownPlan:
+        """Snapshot of the current plan, later edits don't change it"""
+        totals = self.totals
+        return PayDownPlan(
+            self.parsed.start,
+            self.parsed.terms,
+            list(totals.schedule),
+            list(totals.payoff_months),
+            list(totals.interest),
+            list(totals.paid),
+            self.parsed.tax_rate,
+        )
+
+
+def balance_after(balance: float, rate: float, payment: float, months: int) -> float:
+    """
+        Closed form balance after paying a fixed amount for a number of
+        months at a fixed APR, interest is added before each payment
+    """
+    monthly = rate / 1200
+    if monthly == 0:
+        return balance - payment * months
+    growth = (1 + monthly) ** months
+    return balance * growth - payment * (growth - 1) / monthly
+
+
+def months_to_payoff(balance: float, rate: float, payment: float) -> Optional[int]:
+    """
+        Smallest number of fixed payments that brings the balance down
+        to PAID_OFF, None when the payment never outgrows the interest
+    """
+    monthly = rate / 1200
+    if balance <= PAID_OFF:
+        return 0
+    if payment <= balance * monthly:
+        return None
+    if monthly == 0:
+        months = max(math.ceil((balance - PAID_OFF) / payment), 1)
+    else:
+        annuity = payment / monthly
+        growth = (annuity - PAID_OFF) / (annuity - balance)
+        months = max(math.ceil(math.log(growth) / math.log1p(monthly)), 1)
+    while months > 1 and balance_after(balance, rate, payment, months - 1) <= PAID_OFF:
+        months -= 1
+    while balance_after(balance, rate, payment, months) > PAID_OFF:
+        months += 1
+    return months
+
+
+def _fixed_payments(month: int, totals: _Totals, strategy: Callable):
+    """
+        Payment every debt receives while nothing changes: the minimums
+        plus the rest of the budget on the first debt in strategy order.
+        None when the order could change between events (rate ties,
+        budget below the minimums).
+    """
+    terms, balances = totals.parsed.terms, totals.balances
+    active = [i for i, balance in enumerate(balances) if balance > PAID_OFF]
+    payments = {i: terms[i].min_payment_for(month) for i in active}
+    extra = totals.parsed.budget - sum(payments.values())
+    if extra < 0:
+        return None
+    ranked = strategy(month, balances, terms, totals.parsed.tax_rate)
+    ranked = [i for i in ranked if i in payments]
+    rates = [effective_rate(terms[i], month, totals.parsed.tax_rate) for i in ranked]
+    if len(ranked) > 1 and rates[0] == rates[1]:
+        return None
+    payments[ranked[0]] += extra
+    return payments
+
+
+def simulate_events(
+    loans: Iterable,
+    windfalls: Iterable = (),
+    user_info: dict = None,
+    start: date = None,
+    max_months: int = MAX_MONTHS,
+) -> PayDownPlan:
+    """
+        Same plan as simulate (avalanche) but instead of stepping every
+        month it jumps with closed form amortization straight to the next
+        event: a debt being paid off, a promo rate expiring or a windfall.
+        Event months are stepped with pay_month so payments roll over
+        exactly as they do month by month, the schedule only holds rows
+        for event months.
+    """
+    return simulate_portfolio(portfolio(loans, windfalls, user_info, start), max_months)
+
+
+def simulate_portfolio(
+    parsed: Portfolio, max_months: int = MAX_MONTHS, strategy: Callable = avalanche
+) -> PayDownPlan:
+    """
+        simulate_events for an already parsed Portfolio, so callers can
+        vary the budget or windfalls without parsing the config again.
+        Only avalanche and strategies marked event_driven (their order
+        only changes at events) can be used, ValueError for any other
+        such as snowball, whose order follows the balances.
+    """
+    strategy = STRATEGIES[strategy] if isinstance(strategy, str) else strategy
+    if strategy is not avalanche and not getattr(strategy, "event_driven", False):
+        name = getattr(strategy, "__name__", type(strategy).__name__)
+        raise ValueError(f"{name} can change order between events, use simulate")
+    totals = _Totals(parsed)
+    changes = set(parsed.windfalls)
+    changes.update(t.promo_end + 1 for t in parsed.terms)
+
+    month = 0
+    while month < max_months and not totals.done:
+        payments = _fixed_payments(month + 1, totals, strategy)
+        if payments is None:
+            month += 1
+            totals.step(month, strategy)
+            continue
+
+        event = min([m for m in changes if m > month], default=max_months)
+        for i, payment in payments.items():
+            rate = parsed.terms[i].rate_for(month + 1)
+            payoff = months_to_payoff(totals.balances[i], rate, payment)
+            if payoff is not None:
+                event = min(event, month + payoff)
+        event = min(event, max_months)
+
+        regular = event - 1 - month
+        if regular > 0:
+            for i, payment in payments.items():
+                rate = parsed.terms[i].rate_for(month + 1)
+                balance = balance_after(totals.balances[i], rate, payment, regular)
+                totals.interest[i] += payment * regular - totals.balances[i] + balance
+                totals.paid[i] += payment * regular
+                totals.balances[i] = balance
+        month = event
+        totals.step(month, strategy)
+
+    if not totals.done:
+        LOG.warning(f"Debts not paid off within {max_months} months")
+    return totals.plan()
+
+
+def save_plan(plan: PayDownPlan, page_name: str):
+    """Write the locally generated plan next to the html plans"""
+    with open(f"plans/{page_name}.json", "w") as plan_file:
+        json.dump(plan.to_dict(), plan_file, indent=2)
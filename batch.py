@@ -0,0 +1,238 @@
+"""
+    Generate a plan for every config in plan_configs concurrently. Each
+    plan runs its own conversation in a thread pool, a failing config is
+    reported and doesn't stop the rest of the batch.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import Dict, List, NamedTuple, Optional
+
+from debt_pay_down_calculator import run_plan
+from instrumentation import StepMetrics
+from scheduler import PRIORITIES, Scheduler
+from transport import Transport
+from view_state_cache import ViewStateCache
+
+
+LOG = logging.getLogger(__name__)
+
+
+class PlanResult(NamedTuple):
+    plan_name: str
+    ok: bool
+    seconds: float
+    error: Optional[str] = None
+
+
+def load_configs(config_dir: str = "plan_configs") -> Dict[str, dict]:
+    """Plan name to loaded json for every config in the directory"""
+    configs = {}
+    for plan in sorted(os.listdir(config_dir)):
+        if plan.endswith(".json"):
+            with open(os.path.join(config_dir, plan), "r") as loan_json:
+                configs[plan.replace(".json", "")] = json.load(loan_json)
+    return configs
+
+
+def _run_one(plan_name: str, loaded_json: dict, **options) -> PlanResult:
+    started = time.perf_counter()
+    try:
+        run_plan(plan_name=plan_name, loaded_json=loaded_json, **options)
+    except Exception as error:
+        LOG.exception(f"Plan {plan_name} failed")
+        return PlanResult(plan_name, False, time.perf_counter() - started, repr(error))
+    return PlanResult(plan_name, True, time.perf_counter() - started)
+
+
+def run_batch(
+    configs: Dict[str, dict], max_workers: int = 8, **options
+) -> List[PlanResult]:
+    """
+        Run every plan with at most max_workers conversations in flight,
+        options are passed on to run_plan (backend, scheduler, priority,
+        cache, url, metrics, transport, driver_pool, store)
+    """
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_run_one, plan_name, loaded_json, **options)
+            for plan_name, loaded_json in configs.items()
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            LOG.info(
+                f"{result.plan_name}: {'ok' if result.ok else 'FAILED'} "
+                f"in {result.seconds:.2f}s"
+            )
+            results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--config-dir", default="plan_configs")
+    parser.add_argument(
+        "--backend", choices=("http", "selenium", "local"), default="http"
+    )
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument("--chrome-driver-path", default=None)
+    parser.add_argument(
+        "--driver-max-uses",
+        type=int,
+        default=25,
+        help="plans a pooled browser runs before it is recycled",
+    )
+    parser.add_argument(
+        "--lean", action="store_true", help="block images, fonts, ads and the promo"
+    )
+    parser.add_argument(
+        "--store", default=None, help="SQLite plan store to save plans to"
+    )
+    parser.add_argument(
+        "--store-html", action="store_true", help="keep compressed html in the store"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=None, help="max requests per second per host"
+    )
+    parser.add_argument("--burst", type=int, default=1)
+    parser.add_argument(
+        "--max-conversations",
+        type=int,
+        default=None,
+        help="max http conversations in flight across the batch",
+    )
+    parser.add_argument("--priority", choices=tuple(PRIORITIES), default="batch")
+    parser.add_argument(
+        "--scheduler-stats", default=None, help="queue depth and wait times (.json)"
+    )
+    parser.add_argument("--connect-timeout", type=float, default=5.0)
+    parser.add_argument("--read-timeout", type=float, default=30.0)
+    parser.add_argument(
+        "--retries", type=int, default=3, help="retries of a failed http request"
+    )
+    parser.add_argument("--view-state-cache", default=None)
+    parser.add_argument("--url", default=None, help="calculator url to post to")
+    parser.add_argument(
+        "--metrics", default=None, help="per step metrics file (.json or .prom)"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="skip plans whose config hash is unchanged since the last run",
+    )
+    parser.add_argument("--manifest", default=".plan_manifest.json")
+    parser.add_argument(
+        "--watch",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="after the run keep polling the configs and regenerate changed plans",
+    )
+    args = parser.parse_args()
+    step_metrics = StepMetrics() if args.metrics else None
+
+    pool = None
+    if args.backend == "selenium":
+        from driver_pool import DriverPool
+
+        pool = DriverPool(
+            size=args.max_workers,
+            chrome_driver_path=args.chrome_driver_path,
+            max_uses=args.driver_max_uses,
+            lean=args.lean,
+        )
+
+    plan_store = None
+    if args.store:
+        from plan_store import PlanStore
+
+        plan_store = PlanStore(args.store, keep_html=args.store_html)
+
+    scheduler = None
+    if args.rate or args.max_conversations:
+        scheduler = Scheduler(
+            args.rate or float("inf"),
+            burst=args.burst,
+            max_conversations=args.max_conversations,
+        )
+
+    run_options = dict(
+        backend=args.backend,
+        scheduler=scheduler,
+        priority=PRIORITIES[args.priority],
+        cache=ViewStateCache(args.view_state_cache) if args.view_state_cache else None,
+        url=args.url,
+        metrics=step_metrics,
+        transport=Transport(
+            pool_maxsize=max(args.max_workers, 10),
+            connect_timeout=args.connect_timeout,
+            read_timeout=args.read_timeout,
+            retries=args.retries,
+        ),
+        driver_pool=pool,
+        store=plan_store,
+    )
+    configs = load_configs(args.config_dir)
+    manifest, unchanged, cold = None, [], True
+    if args.incremental or args.watch is not None:
+        from manifest import Manifest
+
+        manifest = Manifest(args.manifest)
+        cold = not manifest.entries
+        configs, unchanged = manifest.changed(configs, args.backend)
+
+    started = time.perf_counter()
+    try:
+        with plan_store.transaction() if plan_store else nullcontext():
+            batch_results = run_batch(
+                configs, max_workers=args.max_workers, **run_options
+            )
+        failed = [result for result in batch_results if not result.ok]
+        seconds = time.perf_counter() - started
+        LOG.info(
+            f"{'Cold' if cold else 'Warm'} run: "
+            f"{len(batch_results) - len(failed)}/{len(batch_results)} plans "
+            f"generated in {seconds:.2f}s, {len(unchanged)} unchanged skipped"
+        )
+        for result in failed:
+            LOG.error(f"{result.plan_name}: {result.error}")
+        if manifest:
+            for result in batch_results:
+                if result.ok:
+                    manifest.record(
+                        result.plan_name,
+                        configs[result.plan_name],
+                        args.backend,
+                        stored=plan_store is not None,
+                    )
+            manifest.record_run(cold, len(batch_results), len(unchanged), seconds)
+            manifest.save()
+        if args.watch is not None:
+            from manifest import watch
+
+            try:
+                watch(
+                    args.config_dir,
+                    manifest,
+                    lambda plan_name, loaded_json: run_plan(
+                        plan_name, loaded_json, **run_options
+                    ),
+                    args.backend,
+                    interval=args.watch,
+                    stored=plan_store is not None,
+                )
+            except KeyboardInterrupt:
+                pass
+    finally:
+        if pool:
+            pool.close()
+    if step_metrics:
+        step_metrics.dump(args.metrics)
+    if scheduler and args.scheduler_stats:
+        scheduler.dump(args.scheduler_stats)
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,310 @@
+"""
+    Vectorized version of the amortization engine that advances many
+    portfolios at once. N portfolios of up to M debts are packed into
+    padded N x M arrays and every month is a handful of NumPy operations,
+    paid off (and padding) debts are masked out.
+"""
+import logging
+from datetime import date
+from typing import Iterable
+
+import numpy as np
+
+from amortization import MAX_MONTHS, PAID_OFF, parse_amount
+from models import NO_PROMO, Loans, PlanConfig, month_of
+
+
+LOG = logging.getLogger(__name__)
+
+
+class PortfolioBatch:
+    """
+        Padded arrays describing N portfolios of at most M debts,
+        windfalls are kept as N x W (month, amount) pairs and raises as
+        N x R (first month, monthly amount) pairs added to the budget
+        from that month on
+    """
+
+    def __init__(
+        self,
+        balances: np.ndarray,
+        rates: np.ndarray,
+        promo_rates: np.ndarray,
+        promo_ends: np.ndarray,
+        min_payments: np.ndarray,
+        promo_min_payments: np.ndarray,
+        deductible: np.ndarray,
+        budgets: np.ndarray,
+        tax_rates: np.ndarray,
+        windfall_months: np.ndarray,
+        windfall_amounts: np.ndarray,
+        raise_months: np.ndarray = None,
+        raise_amounts: np.ndarray = None,
+    ):
+        self.balances = balances
+        self.rates = rates
+        self.promo_rates = promo_rates
+        self.promo_ends = promo_ends
+        self.min_payments = min_payments
+        self.promo_min_payments = promo_min_payments
+        self.deductible = deductible
+        self.budgets = budgets
+        self.tax_rates = tax_rates
+        self.windfall_months = windfall_months
+        self.windfall_amounts = windfall_amounts
+        count = balances.shape[0]
+        self.raise_months = (
+            np.zeros((count, 0), dtype=np.int64)
+            if raise_months is None
+            else raise_months
+        )
+        self.raise_amounts = (
+            np.zeros((count, 0)) if raise_amounts is None else raise_amounts
+        )
+
+    def __len__(self):
+        return self.balances.shape[0]
+
+    def repeat(self, count: int) -> "PortfolioBatch":
+        """Every portfolio repeated count times in a row, e.g. for trials"""
+        return PortfolioBatch(
+            **{
+                name: np.repeat(values, count, axis=0)
+                for name, values in vars(self).items()
+            }
+        )
+
+    @classmethod
+    def from_configs(cls, configs: Iterable[dict], start: date = None):
+        """
+            Pack loaded plan_configs json into padded arrays. The loans of
+            every config are put in one set of columns and scattered into
+            the padded arrays at once.
+        """
+        start = (start or date.today()).replace(day=1)
+        start_month = month_of(start)
+        loans, windfalls = [], []
+        counts, budget_savings, tax_rates = [], [], []
+        for n, config in enumerate(configs):
+            config = PlanConfig.from_json(config)
+            loans.extend(config.loans)
+            counts.append(len(config.loans))
+            windfalls.extend(
+                (n, windfall.month - start_month + 1, windfall.amount_cents)
+                for windfall in config.windfalls
+                if windfall.month >= start_month
+            )
+            budget_savings.append(parse_amount(config.budget_savings))
+            tax_rates.append(parse_amount(config.tax_bracket) / 100)
+
+        count = len(counts)
+        counts = np.array(counts, dtype=np.int64)
+        rows = np.repeat(np.arange(count), counts)
+        # position of each loan within its portfolio
+        slots = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+        columns = Loans(loans).columns()
+        min_payments = columns["min_payment_cents"] / 100
+        promo_end = columns["promo_end_month"]
+
+        debts = int(counts.max()) if count else 0
+        shape = (count, debts)
+        batch = cls(
+            balances=np.zeros(shape),
+            rates=np.zeros(shape),
+            promo_rates=np.zeros(shape),
+            promo_ends=np.zeros(shape, dtype=np.int64),
+            min_payments=np.zeros(shape),
+            promo_min_payments=np.zeros(shape),
+            deductible=np.zeros(shape, dtype=bool),
+            budgets=np.bincount(rows, min_payments, count) + budget_savings,
+            tax_rates=np.array(tax_rates, dtype=float),
+            windfall_months=np.zeros((count, 0), dtype=np.int64),
+            windfall_amounts=np.zeros((count, 0)),
+        )
+        batch.balances[rows, slots] = columns["balance_cents"] / 100
+        batch.rates[rows, slots] = columns["rate_bp"] / 100
+        batch.promo_rates[rows, slots] = columns["promo_rate_bp"] / 100
+        batch.promo_ends[rows, slots] = np.where(
+            promo_end == NO_PROMO, 0, promo_end - start_month + 1
+        )
+        batch.min_payments[rows, slots] = min_payments
+        batch.promo_min_payments[rows, slots] = columns["promo_min_payment_cents"] / 100
+        batch.deductible[rows, slots] = columns["tax_deductible"]
+
+        if windfalls:
+            # windfalls landing in the same month of a portfolio are one event
+            rows, months, cents = np.array(windfalls, dtype=np.int64).T
+            events, event = np.unique(
+                np.stack([rows, months], 1), axis=0, return_inverse=True
+            )
+            amounts = np.zeros(len(events))
+            np.add.at(amounts, event.ravel(), cents / 100)
+            rows, months = events.T
+            per_row = np.bincount(rows, minlength=count)
+            slots = np.arange(len(rows)) - np.repeat(
+                np.cumsum(per_row) - per_row, per_row
+            )
+            shape = (count, int(per_row.max()))
+            batch.windfall_months = np.zeros(shape, dtype=np.int64)
+            batch.windfall_amounts = np.zeros(shape)
+            batch.windfall_months[rows, slots] = months
+            batch.windfall_amounts[rows, slots] = amounts
+        return batch
+
+
+class BatchResult:
+    """
+        Outcome of every debt of every portfolio. Payoff months are 0
+        for padding/empty debts and -1 when not paid off in the horizon
+    """
+
+    def __init__(self, payoff_months: np.ndarray, interest: np.ndarray, months: int):
+        self.payoff_months = payoff_months
+        self.interest = interest
+        self.months = months
+
+    @property
+    def total_interest(self) -> np.ndarray:
+        return self.interest.sum(axis=1)
+
+    @property
+    def paid_off(self) -> np.ndarray:
+        return (self.payoff_months >= 0).all(axis=1)
+
+    @property
+    def debt_free_months(self) -> np.ndarray:
+        """Month the last debt was paid, -1 if still in debt"""
+        return np.where(self.paid_off, self.payoff_months.max(axis=1, initial=0), -1)
+
+
+def _pay_in_order(balances: np.ndarray, cash: np.ndarray, order: np.ndarray):
+    """
+        Pay down the (debts x portfolios) balances in place, rank by rank
+        in the given order, until each portfolio's cash runs out
+    """
+    portfolios = np.arange(balances.shape[1])
+    for debts in order:
+        owed = balances[debts, portfolios]
+        payment = np.minimum(owed * (owed > PAID_OFF), cash)
+        balances[debts, portfolios] = owed - payment
+        cash -= payment
+        if not cash.any():
+            break
+
+
+def _avalanche_order(balances: np.ndarray, effective_rates: np.ndarray):
+    """Highest after tax rate first, smaller balance breaks ties"""
+    return np.lexsort((balances, -effective_rates), axis=0)
+
+
+def _has_ties(effective_rates: np.ndarray) -> np.ndarray:
+    """Portfolios where two debts share a rate and balances decide the order"""
+    ordered = np.sort(effective_rates, axis=0)
+    return (ordered[1:] == ordered[:-1]).any(axis=0)
+
+
+def simulate_batch(
+    batch: PortfolioBatch, strategy: str = "avalanche", max_months: int = MAX_MONTHS
+) -> BatchResult:
+    """
+        Simulate every portfolio in the batch, month by month, with the
+        same rules as amortization.simulate.
+
+        The working arrays are transposed to debts x portfolios so every
+        operation runs over long contiguous rows, finished portfolios are
+        dropped from them and the avalanche order is only recomputed when
+        a promo ends or two rates tie.
+    """
+    count, debts = batch.balances.shape
+    payoff_months = np.where(batch.balances > PAID_OFF, -1, 0)
+    interest_paid = np.zeros((count, debts))
+
+    live = np.arange(count)
+    columns = {
+        "balances": batch.balances.T.copy(),
+        "promo_ends": batch.promo_ends.T,
+        "promo_rates": batch.promo_rates.T,
+        "rates": batch.rates.T,
+        "promo_minimums": batch.promo_min_payments.T,
+        "minimums": batch.min_payments.T,
+        "tax_discount": 1 - batch.tax_rates * batch.deductible.T,
+        "budgets": batch.budgets,
+        "windfall_months": batch.windfall_months.T,
+        "windfall_amounts": batch.windfall_amounts.T,
+        "raise_months": batch.raise_months.T,
+        "raise_amounts": batch.raise_amounts.T,
+        "payoffs": payoff_months.T.copy(),
+        "interest": interest_paid.T.copy(),
+    }
+    regime_changes = set((batch.promo_ends + 1).ravel().tolist())
+    order = ties = None
+
+    month = 0
+    for month in range(1, max_months + 1):
+        active = columns["balances"] > PAID_OFF
+        running = active.any(axis=0)
+        if not running.any():
+            month -= 1
+            break
+        if running.sum() < 0.75 * len(live):
+            payoff_months[live] = columns["payoffs"].T
+            interest_paid[live] = columns["interest"].T
+            keep = np.flatnonzero(running)
+            live, active = live[keep], active[:, keep]
+            columns = {name: values[..., keep] for name, values in columns.items()}
+            if ties is not None:
+                order, ties = order[:, keep], ties[keep]
+        balances = columns["balances"]
+
+        promo = month <= columns["promo_ends"]
+        rates = np.where(promo, columns["promo_rates"], columns["rates"])
+        interest = balances * rates
+        interest *= active
+        interest /= 1200
+        balances += interest
+        columns["interest"] += interest
+
+        cash = columns["budgets"].copy()
+        if columns["windfall_months"].size:
+            landed = columns["windfall_months"] == month
+            cash += (columns["windfall_amounts"] * landed).sum(axis=0)
+        if columns["raise_months"].size:
+            started = columns["raise_months"] <= month
+            cash += (columns["raise_amounts"] * started).sum(axis=0)
+        due = np.minimum(
+            balances, np.where(promo, columns["promo_minimums"], columns["minimums"])
+        )
+        due *= active
+        if (due.sum(axis=0) <= cash).all():
+            balances -= due
+            cash -= due.sum(axis=0)
+        else:
+            # some portfolio can't meet every minimum, each pays its
+            # minimums in debt order until its own cash runs out
+            for debt in range(debts):
+                payment = np.minimum(due[debt], cash)
+                balances[debt] -= payment
+                cash -= payment
+
+        if strategy == "snowball":
+            order = np.argsort(balances, axis=0, kind="stable")
+        else:
+            effective_rates = rates * columns["tax_discount"]
+            if ties is None or month in regime_changes:
+                order = _avalanche_order(balances, effective_rates)
+                ties = _has_ties(effective_rates)
+            elif ties.any():
+                order[:, ties] = _avalanche_order(
+                    balances[:, ties], effective_rates[:, ties]
+                )
+        _pay_in_order(balances, cash, order)
+
+        payoffs = columns["payoffs"]
+        payoffs[(payoffs < 0) & (balances <= PAID_OFF)] = month
+
+    payoff_months[live] = columns["payoffs"].T
+    interest_paid[live] = columns["interest"].T
+    if (payoff_months < 0).any():
+        LOG.warning(f"Some debts not paid off within {max_months} months")
+
+    return BatchResult(payoff_months, interest_paid, month)
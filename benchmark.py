@@ -0,0 +1,336 @@
+"""
+    Benchmarks for every stage of plan generation: loading configs, each
+    DebtCalculatorClient step against a local ReplayServer, parsing the
+    responses, page load and the Selenium Calculator flow with and without
+    lean sessions, and the local engines. Results are written as JSON with
+    percentiles and can be compared against a stored baseline.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, List
+
+import requests
+from bs4 import BeautifulSoup
+
+from amortization import (
+    MAX_MONTHS,
+    IncrementalPlan,
+    parse_amount,
+    simulate,
+    simulate_events,
+)
+from batch_amortization import PortfolioBatch, simulate_batch
+from cents_amortization import CentsBatch, simulate_cents
+from debt_pay_down_calculator import (
+    DebtCalculatorClient,
+    Loans,
+    Windfall,
+    get_view_state,
+    save_page,
+)
+from replay_server import ReplayServer
+
+
+LOG = logging.getLogger(__name__)
+
+CLIENT_STEPS = (
+    "declare_number_of_debts",
+    "post_lender_name_and_loan_type",
+    "enter_loan_balance",
+    "enter_loan_details",
+    "is_change_loan_details",
+    "select_promo_type",
+    "post_promo_details",
+    "add_interest_rate_and_payments",
+    "continue_to_saving_options",
+    "budget_savings",
+    "forecasted_raises",
+    "forecasted_windfalls",
+    "select_tax_bracket",
+    "generate_plan",
+)
+
+
+class Timings:
+    """Samples in milliseconds per stage name"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    @contextmanager
+    def time(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[stage].append((time.perf_counter() - started) * 1000)
+
+    def summary(self) -> Dict[str, dict]:
+        return {stage: summarize(samples) for stage, samples in self.samples.items()}
+
+
+def percentile(ordered: List[float], percent: float) -> float:
+    """Nearest rank percentile of an already sorted list"""
+    index = max(int(round(percent / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def summarize(samples: List[float]) -> dict:
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "min": ordered[0],
+        "p50": percentile(ordered, 50),
+        "p90": percentile(ordered, 90),
+        "p99": percentile(ordered, 99),
+        "max": ordered[-1],
+    }
+
+
+def synthetic_config(debts: int, seed: int = 0) -> dict:
+    """A plan config with a mix of loans, cards and promo cards"""
+    rng = random.Random(seed)
+    loans = []
+    for index in range(debts):
+        balance = round(rng.uniform(500, 25000), 2)
+        rate = str(round(rng.uniform(3, 25), 2))
+        loan = {
+            "lender_name": f"Debt {index + 1}",
+            "interest_rate": rate,
+            "balance": f"{balance:,.2f}",
+            "min_monthly_payment": f"{max(balance * 0.03, 25):.2f}",
+            "loan_type": "Other kind of loan",
+            "promo": None,
+            "deductible": rng.choice(["0", "1"]),
+        }
+        if index % 3:
+            loan["loan_type"] = "Credit card or retailer charge card"
+        if index % 3 == 2:
+            loan["promo"] = {
+                "regular_rate": rate,
+                "promo_rate": "0",
+                "end_date": f"{rng.randint(1, 12):02d}/15/{date.today().year + 1}",
+                "minimum_monthly_payment": loan["min_monthly_payment"],
+                "promo_type": "A low introductory interest rate that "
+                "will increase at a later date",
+            }
+        loans.append(loan)
+    return {
+        "loans": loans,
+        "windfalls": [
+            {"amount": "1,000", "date": f"04/11/{date.today().year + 1}"},
+            {"amount": "1,000", "date": f"04/11/{date.today().year + 2}"},
+        ],
+        "user": {"tax_bracket": "28", "budget_savings": "250", "raises": "0"},
+    }
+
+
+def synthetic_page(view_state_bytes: int = 20000, filler_bytes: int = 200000):
+    """Calculator-like page with a view state and a results div"""
+    view_state = ("/wEPDwUKLTk" * (view_state_bytes // 11 + 1))[:view_state_bytes]
+    filler = "<p>Lorem ipsum dolor sit amet</p>" * (filler_bytes // 33)
+    return (
+        "<html><head><title>Debt pay down calculator</title></head><body>"
+        '<form method="post">'
+        '<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" '
+        f'value="{view_state}" />'
+        f'{filler}<div class="calculator"><table><tr><th>Month</th></tr>'
+        "<tr><td>1</td></tr></table></div></form></body></html>"
+    ).encode()
+
+
+def timed_client_class(timings: Timings):
+    """DebtCalculatorClient subclass timing each step"""
+
+    def timed(step: str):
+        method = getattr(DebtCalculatorClient, step)
+
+        def wrapper(self, *args, **kwargs):
+            with timings.time(f"client.{step}"):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return type(
+        "TimedDebtCalculatorClient",
+        (DebtCalculatorClient,),
+        {step: timed(step) for step in CLIENT_STEPS},
+    )
+
+
+def bench_config_loading(timings: Timings, config: dict, label: str, repeat: int):
+    for _ in range(repeat):
+        with timings.time(f"config.load[{label}]"):
+            list(Loans(config["loans"]))
+            [Windfall(**wf) for wf in config["windfalls"]]
+
+
+def bench_local(timings: Timings, config: dict, label: str, repeat: int):
+    loans, user = Loans(config["loans"]), config["user"]
+    windfalls = [Windfall(**wf) for wf in config["windfalls"]]
+    for _ in range(repeat):
+        with timings.time(f"local.simulate[{label}]"):
+            simulate(loans, windfalls, user)
+        with timings.time(f"local.simulate_events[{label}]"):
+            simulate_events(loans, windfalls, user)
+    # one budget edit three quarters into the plan, resumed from a checkpoint
+    incremental = IncrementalPlan.from_config(loans, windfalls, user)
+    late = max((incremental.plan.debt_free_month or MAX_MONTHS) * 3 // 4, 1)
+    savings = parse_amount(user.get("budget_savings"))
+    for edit in range(repeat):
+        incremental.set_budget_savings(savings + edit + 1, from_month=late)
+        with timings.time(f"local.incremental_edit[{label}]"):
+            incremental.recalculate()
+    batch = PortfolioBatch.from_configs([config] * 1000)
+    for _ in range(repeat):
+        with timings.time(f"local.simulate_batch_1000[{label}]"):
+            simulate_batch(batch)
+    cents_batch = CentsBatch.from_configs([config] * 1000)
+    for _ in range(repeat):
+        with timings.time(f"local.simulate_cents_1000[{label}]"):
+            simulate_cents(cents_batch)
+
+
+def bench_parsing(timings: Timings, page: bytes, repeat: int):
+    for _ in range(repeat):
+        response = requests.Response()
+        response._content, response._content_consumed = page, True
+        response.status_code = 200
+        with timings.time("parse.get_view_state"):
+            get_view_state(response)
+        with timings.time("parse.save_page"):
+            save_page(response, "benchmark")
+        with timings.time("parse.beautifulsoup"):
+            BeautifulSoup(page, "html.parser").select_one("input#__VIEWSTATE")
+
+
+def bench_http(timings: Timings, config: dict, label: str, repeat: int, url: str):
+    client_class = timed_client_class(timings)
+    loans = Loans(config["loans"])
+    windfalls = [Windfall(**wf) for wf in config["windfalls"]]
+    for _ in range(repeat):
+        with timings.time(f"http.plan[{label}]"):
+            with client_class(
+                plan_name="benchmark",
+                number_of_debts=len(loans),
+                user_info=config["user"],
+                windfalls=windfalls,
+                url=url,
+            ) as client:
+                for loan in loans:
+                    client.add_loan(loan=loan)
+
+
+def bench_selenium(
+    timings: Timings, config: dict, label: str, repeat: int, driver_path: str
+):
+    """Page load and plan time in a fresh browser, with and without make_lean"""
+    from wrapped_driver import WrappedDriver
+    from calculator_page import Calculator
+    from client import CalculatorClient
+    from lean_browser import make_lean
+
+    for lean in (False, True):
+        mode = "lean" if lean else "full"
+        for _ in range(repeat):
+            driver = WrappedDriver(chrome_driver_path=driver_path, browser="headless")
+            try:
+                if lean:
+                    make_lean(driver)
+                with timings.time(f"selenium.page_load.{mode}"):
+                    Calculator(webdriver=driver).open_calculator()
+                with timings.time(f"selenium.plan.{mode}[{label}]"):
+                    CalculatorClient("benchmark", config)(webdriver=driver, pooled=True)
+            finally:
+                driver.quit_driver()
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float):
+    """Stages whose p50 got slower than the baseline by more than tolerance"""
+    regressions = {}
+    for stage, stats in results.items():
+        before = baseline.get(stage)
+        if before and stats["p50"] > before["p50"] * (1 + tolerance):
+            regressions[stage] = {"baseline": before["p50"], "p50": stats["p50"]}
+    return regressions
+
+
+def bench_all(timings: Timings, args, page: bytes, fixtures: List[str]):
+    """Every stage for every debt count, plans go to the working directory"""
+    with ReplayServer(fixtures, latency=args.latency, default_page=page) as replay:
+        bench_parsing(timings, page, args.repeat)
+        for debt_count in args.debts:
+            plan_config = synthetic_config(debt_count)
+            size = f"{debt_count}-debts"
+            bench_config_loading(timings, plan_config, size, args.repeat)
+            bench_local(timings, plan_config, size, args.repeat)
+            bench_http(timings, plan_config, size, args.repeat, replay.url)
+            if args.chrome_driver_path:
+                if args.calculator_url:
+                    from calculator_page import Calculator
+
+                    Calculator.CALCULATOR_URL = args.calculator_url
+                bench_selenium(timings, plan_config, size, 1, args.chrome_driver_path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--debts", type=int, nargs="+", default=[1, 5, 10, 25, 50])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--view-state-bytes", type=int, default=20000)
+    parser.add_argument("--fixtures", nargs="*", default=[])
+    parser.add_argument("--chrome-driver-path", default=None)
+    parser.add_argument(
+        "--calculator-url",
+        default=None,
+        help="local copy of the calculator page, bankrate.com when not given",
+    )
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    baseline_path = args.baseline and os.path.abspath(args.baseline)
+    page = synthetic_page(args.view_state_bytes)
+    bench_timings = Timings()
+
+    fixtures = [os.path.abspath(path) for path in args.fixtures]
+    home = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="debt-benchmark-") as work_dir:
+        os.makedirs(os.path.join(work_dir, "plans"))
+        os.chdir(work_dir)
+        try:
+            bench_all(bench_timings, args, page, fixtures)
+        finally:
+            os.chdir(home)
+
+    summary = bench_timings.summary()
+    with open(output, "w") as results_file:
+        json.dump(summary, results_file, indent=2, sort_keys=True)
+    for stage_name, stage in sorted(summary.items()):
+        print(
+            f"{stage_name:55} p50 {stage['p50']:9.3f}ms  "
+            f"p90 {stage['p90']:9.3f}ms  p99 {stage['p99']:9.3f}ms"
+        )
+
+    if baseline_path:
+        with open(baseline_path, "r") as baseline_file:
+            slower = compare(summary, json.load(baseline_file), args.tolerance)
+        for stage_name, change in sorted(slower.items()):
+            print(
+                f"REGRESSION {stage_name}: {change['baseline']:.3f}ms -> "
+                f"{change['p50']:.3f}ms"
+            )
+        raise SystemExit(1 if slower else 0)
@@ -0,0 +1,253 @@
+"""
+    Run the Selenium client over every config in plan_configs with a farm
+    of worker processes. Each worker owns one warm headless browser, takes
+    one plan at a time from the parent's queue and writes its results to
+    plans/. Jobs that time out or crash the browser are retried on a fresh
+    browser, and a worker whose process tree grows past the memory ceiling
+    restarts its browser before taking the next plan.
+"""
+import argparse
+import logging
+import os
+import signal
+import time
+from collections import deque
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait
+from typing import Dict, List
+
+from selenium.common.exceptions import WebDriverException
+
+from batch import PlanResult, load_configs
+from debt_pay_down_calculator import run_plan
+from driver_pool import DriverPool
+
+
+LOG = logging.getLogger(__name__)
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def process_tree_rss(pid: int) -> int:
+    """Resident bytes of pid and all its descendants, 0 without /proc"""
+    children, rss = {}, {}
+    try:
+        entries = os.listdir("/proc")
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as stat_file:
+                stat = stat_file.read()
+            with open(f"/proc/{entry}/statm", "r") as statm_file:
+                resident = int(statm_file.read().split()[1]) * PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            continue
+        parent = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(parent, []).append(int(entry))
+        rss[int(entry)] = resident
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += rss.get(current, 0)
+        stack.extend(children.get(current, ()))
+    return total
+
+
+def _worker(
+    connection, chrome_driver_path: str, max_rss_mb: float, max_uses: int, lean: bool
+):
+    # own process group so a hung worker is killed along with its browser
+    os.setsid()
+    pool = DriverPool(
+        size=1, chrome_driver_path=chrome_driver_path, max_uses=max_uses, lean=lean
+    )
+    try:
+        while True:
+            job = connection.recv()
+            if job is None:
+                break
+            plan_name, loaded_json = job
+            started = time.perf_counter()
+            retry = False
+            try:
+                run_plan(plan_name, loaded_json, backend="selenium", driver_pool=pool)
+                result = PlanResult(plan_name, True, time.perf_counter() - started)
+            except Exception as error:
+                LOG.exception(f"Plan {plan_name} failed")
+                retry = isinstance(error, WebDriverException)
+                result = PlanResult(
+                    plan_name, False, time.perf_counter() - started, repr(error)
+                )
+            rss_mb = process_tree_rss(os.getpid()) / 2 ** 20
+            if max_rss_mb and rss_mb > max_rss_mb:
+                LOG.info(f"Worker at {rss_mb:.0f}MB, restarting its browser")
+                pool.quit_idle()
+            connection.send((result, retry))
+    finally:
+        pool.close()
+
+
+class Worker:
+    def __init__(self, process: Process, connection):
+        self.process = process
+        self.connection = connection
+        self.job = None
+        self.started = None
+
+
+class BrowserFarm:
+    """
+        workers processes with a browser each, every plan gets timeout
+        seconds and up to retries more attempts after a crash or timeout
+    """
+
+    def __init__(
+        self,
+        workers: int = None,
+        chrome_driver_path: str = None,
+        timeout: float = 300,
+        retries: int = 2,
+        max_rss_mb: float = None,
+        max_uses: int = 25,
+        lean: bool = False,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.chrome_driver_path = chrome_driver_path
+        self.timeout = timeout
+        self.retries = retries
+        self.max_rss_mb = max_rss_mb
+        self.max_uses = max_uses
+        self.lean = lean
+
+    def _start_worker(self) -> Worker:
+        parent_end, child_end = Pipe()
+        process = Process(
+            target=_worker,
+            args=(
+                child_end,
+                self.chrome_driver_path,
+                self.max_rss_mb,
+                self.max_uses,
+                self.lean,
+            ),
+            daemon=True,
+        )
+        process.start()
+        child_end.close()
+        return Worker(process, parent_end)
+
+    @staticmethod
+    def _kill(worker: Worker):
+        try:
+            os.killpg(worker.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        worker.process.join()
+        worker.connection.close()
+
+    def run(self, configs: Dict[str, dict]) -> List[PlanResult]:
+        os.makedirs("plans", exist_ok=True)
+        pending = deque((name, config, 1) for name, config in configs.items())
+        workers = [self._start_worker() for _ in range(min(self.workers, len(pending)))]
+        results = []
+
+        def finish(worker: Worker, result: PlanResult, retry: bool):
+            plan_name, config, attempt = worker.job
+            worker.job = None
+            if not result.ok and retry and attempt <= self.retries:
+                LOG.warning(f"Retrying {plan_name} after: {result.error}")
+                pending.append((plan_name, config, attempt + 1))
+            else:
+                LOG.info(
+                    f"{plan_name}: {'ok' if result.ok else 'FAILED'} "
+                    f"in {result.seconds:.2f}s"
+                )
+                results.append(result)
+
+        try:
+            while pending or any(worker.job for worker in workers):
+                for worker in workers:
+                    if worker.job is None and pending:
+                        worker.job, worker.started = pending.popleft(), time.monotonic()
+                        worker.connection.send(worker.job[:2])
+                busy = [worker for worker in workers if worker.job]
+                deadline = min(worker.started for worker in busy) + self.timeout
+                ready = wait(
+                    [worker.connection for worker in busy],
+                    timeout=max(deadline - time.monotonic(), 0),
+                )
+                for index, worker in enumerate(workers):
+                    if not worker.job:
+                        continue
+                    elapsed = time.monotonic() - worker.started
+                    if worker.connection in ready:
+                        try:
+                            finish(worker, *worker.connection.recv())
+                            continue
+                        except EOFError:
+                            error = "worker died"
+                    elif elapsed >= self.timeout:
+                        error = f"timed out after {elapsed:.0f}s"
+                    else:
+                        continue
+                    job = worker.job
+                    self._kill(worker)
+                    workers[index] = self._start_worker()
+                    workers[index].job = job
+                    finish(
+                        workers[index], PlanResult(job[0], False, elapsed, error), True
+                    )
+        finally:
+            for worker in workers:
+                if worker.process.is_alive():
+                    worker.connection.send(None)
+            for worker in workers:
+                worker.process.join(timeout=30)
+                if worker.process.is_alive():
+                    self._kill(worker)
+        return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(processName)s: %(message)s"
+    )
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--config-dir", default="plan_configs")
+    parser.add_argument("--workers", type=int, default=None, help="default: cores")
+    parser.add_argument("--chrome-driver-path", default=None)
+    parser.add_argument("--timeout", type=float, default=300, help="seconds per plan")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument(
+        "--max-rss-mb",
+        type=float,
+        default=None,
+        help="restart a worker's browser once its processes use this much memory",
+    )
+    parser.add_argument("--driver-max-uses", type=int, default=25)
+    parser.add_argument(
+        "--lean", action="store_true", help="block images, fonts, ads and the promo"
+    )
+    args = parser.parse_args()
+
+    started_at = time.perf_counter()
+    farm_results = BrowserFarm(
+        workers=args.workers,
+        chrome_driver_path=args.chrome_driver_path,
+        timeout=args.timeout,
+        retries=args.retries,
+        max_rss_mb=args.max_rss_mb,
+        max_uses=args.driver_max_uses,
+        lean=args.lean,
+    ).run(load_configs(args.config_dir))
+    failed = [result for result in farm_results if not result.ok]
+    LOG.info(
+        f"{len(farm_results) - len(failed)}/{len(farm_results)} plans generated "
+        f"in {time.perf_counter() - started_at:.2f}s"
+    )
+    for result in failed:
+        LOG.error(f"{result.plan_name}: {result.error}")
+    raise SystemExit(1 if failed else 0)
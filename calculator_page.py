@@ -4,13 +4,14 @@ Page objects for the debt pay down calculator
 import logging
 from datetime import datetime
 from sys import stdout
-from typing import List
 
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import NoSuchElementException, WebDriverException
 
 from wrapped_driver import WrappedDriver
-from util import click_visible_element, send_keys_recursive
+from instrumentation import StepMetrics, timed_action
+from models import Loan, Loans, Promotion, Windfall  # noqa: F401 re-exported
+from util import click_visible_element, send_keys_fast
 
 
 logging.basicConfig(
@@ -40,86 +41,12 @@ loan_types = {
 }
 
 
-class Promotion:
-    """
-        Credit Card Promotion Details
-    """
-
-    def __init__(
-        self,
-        regular_rate,
-        promo_rate,
-        end_date: str,
-        minimum_monthly_payment,
-        promo_type: str,
-    ):
-        self.regular_rate = regular_rate
-        self.promo_rate = promo_rate
-        self.end_date = end_date
-        self.minimum_monthly_payment = minimum_monthly_payment
-        self.promo_type = promo_type
-
-
-class Loan:
-    """
-        Loan or Credit Card
-    """
-
-    def __init__(
-        self,
-        lender_name: str,
-        interest_rate,
-        balance,
-        min_monthly_payment,
-        loan_type,
-        promo: dict = None,
-        deductible: str = "1",
-    ):
-        self.lender_name = lender_name
-        self.interest_rate = interest_rate
-        self.balance = balance
-        self.min_monthly_payment = min_monthly_payment
-        self.loan_type = loan_type
-        self.promo = promo
-        self.deductible = deductible
-
-    def __repr__(self):
-        return f"<Loan: {self.lender_name} - {self.balance} - {self.loan_type}>"
-
-    @property
-    def promo_details(self) -> Promotion:
-        if self.promo:
-            return Promotion(**self.promo)
-
-
-class Loans:
-    def __init__(self, loans: List[Loan]):
-        self.loans = loans
-
-    def __len__(self):
-        return len(self.loans)
-
-    def __iter__(self) -> Loan:
-        for loan in self.loans:
-            yield Loan(**loan)
-
-
-class Windfall:
-    """
-        Cash 'windfalls': Any one-time events that will
-        increase the cash you have in a given month
-    """
-
-    def __init__(self, amount: str, date: str):
-        self.amount = amount
-        self.date = date
-
-
 class BasePage:
     """Base page object to share common objects and methods"""
 
-    def __init__(self, webdriver: WrappedDriver):
+    def __init__(self, webdriver: WrappedDriver, metrics: StepMetrics = None):
         self.driver = webdriver
+        self.metrics = metrics
 
 
 class DatePicker:
@@ -127,14 +54,61 @@ class DatePicker:
 
     YEAR_CELLS = "//span[text()='{}'][contains(@class, 'cell year')]"
     YEAR_HEADER = "div.vdp-datepicker__calendar header span"
+    SELECT_DATE_SCRIPT = """
+    var done = arguments[arguments.length - 1];
+    var picker = arguments[0].closest(".vdp-datepicker");
+    var vm = picker && picker.__vue__;
+    if (!vm || !vm.selectDate) { return done(null); }
+    var date = new Date(arguments[1], arguments[2] - 1, arguments[3]);
+    vm.selectDate({timestamp: date.getTime()});
+    if (vm.close) { vm.close(true); }
+    vm.$nextTick(function () {
+        var selected = vm.selectedDate;
+        var input = picker.querySelector("input");
+        done({
+            selected: selected && [
+                selected.getFullYear(), selected.getMonth() + 1, selected.getDate()
+            ],
+            rendered: input && input.value
+        });
+    });
+    """
 
-    def __init__(self, webdriver: WrappedDriver, date: str):
+    def __init__(self, webdriver: WrappedDriver, date: str, element=None):
+        """
+            With the date input element the date is set directly on the
+            vdp-datepicker component, otherwise the calendar is assumed open
+            and clicked through
+        """
         self.driver = webdriver
         self.datetime = datetime.strptime(date, "%m/%d/%Y")
         self.year = self.datetime.year
         self.month = self.datetime.strftime("%B")
         self.day = self.datetime.day
-        self.select_date()
+        if element is None:
+            self.select_date()
+        elif not self.set_date(element):
+            LOGGER.info(f"Date {date} not set directly, clicking through calendar.")
+            element.click()
+            self.select_date()
+
+    def set_date(self, element) -> bool:
+        """Select the date on the Vue component and verify it was rendered"""
+        try:
+            result = self.driver.driver.execute_async_script(
+                self.SELECT_DATE_SCRIPT,
+                element,
+                self.year,
+                self.datetime.month,
+                self.day,
+            )
+        except WebDriverException:
+            return False
+        return bool(
+            result
+            and result.get("selected") == [self.year, self.datetime.month, self.day]
+            and str(self.year) in (result.get("rendered") or "")
+        )
 
     def nav_up(self):
         """Navigate to the highest level for DatePicker from days to decade."""
@@ -227,31 +201,46 @@ class Calculator(BasePage):
     START_OVER_BUTTON = "//button[contains(text(), 'Start over')]"
     RESULTS_DIV = "//h5[text()='Results']/.."
 
+    @timed_action
     def open_calculator(self):
         """Open driver to calculator page."""
         self.driver.open(self.CALCULATOR_URL)
 
+    @timed_action
+    def start_over(self):
+        """Reset the form for the next plan, reload if there is no Start over."""
+        try:
+            self.driver.driver.find_element_by_xpath(self.START_OVER_BUTTON).click()
+        except NoSuchElementException:
+            LOGGER.info("No Start over button, reloading calculator.")
+            self.driver.driver.refresh()
+        self.driver.wait_for_element_to_be_present(By.ID, self.DEBT_COUNT_INPUT)
+
+    @timed_action
     def declare_number_of_debts(self, debts: str):
         """How many debts do you want to include in your plan?"""
         input_box = self.driver.get_element_by_id(self.DEBT_COUNT_INPUT)
-        send_keys_recursive(input_box, debts)
+        send_keys_fast(input_box, debts)
 
+    @timed_action
     def declare_additional_income(self, number: str):
         """
         Do you expect any additional income income that you
         can apply to your payments?
         """
         input_box = self.driver.get_element_by_id(self.ADDITIONAL_INCOME_INPUT)
-        send_keys_recursive(input_box, number)
+        send_keys_fast(input_box, number)
 
+    @timed_action
     def declare_extra_payments(self, number: str):
         """
         If you have a lot of high interest rate debt to pay down,
         then it is best to pay that down instead of saving at a low rate.
         """
         input_box = self.driver.get_element_by_id(self.EXTRA_PAYMENT_INPUT)
-        send_keys_recursive(input_box, number)
+        send_keys_fast(input_box, number)
 
+    @timed_action
     def select_tax_bracket(self, bracket: str, default_bracket: str = "10"):
         """What tax bracket are you in?"""
         drop_down = self.driver.get_element_by_id(default_bracket)
@@ -260,6 +249,7 @@ class Calculator(BasePage):
             f"//span[text()='{tax_brackets.get(bracket)}']"
         ).click()
 
+    @timed_action
     def select_loan_type(self, index: int, loan_type: int):
         """Add loan type."""
         loan_type_drop_down = self.driver.get_element_by_id(f"loanType{index}")
@@ -268,6 +258,7 @@ class Calculator(BasePage):
             f"//span[text()='{loan_types.get(loan_type)}']"
         )[index].click()
 
+    @timed_action
     def select_additional_income_type(self, index: int, income_type: str):
         """Select Windfall or Raise"""
         income_type_drop_down = self.driver.get_element_by_id(
@@ -278,54 +269,57 @@ class Calculator(BasePage):
             index
         ].click()
 
+    @timed_action
     def add_credit_card(self, index: int, card: Loan):
         """Adding basic Credit card or retailer charge card"""
         self.select_loan_type(index, 0)
         loan_name_input = self.driver.get_element_by_id(
             self.CARD_LENDER_NAME_INPUT.format(index=index)
         )
-        send_keys_recursive(loan_name_input, card.lender_name)
+        send_keys_fast(loan_name_input, card.lender_name)
         remaining_balance_input = self.driver.get_element_by_id(
             self.CARD_BALANCE_INPUT.format(index=index)
         )
-        send_keys_recursive(remaining_balance_input, card.balance)
+        send_keys_fast(remaining_balance_input, card.balance)
         interest_rate = self.driver.get_element_by_id(
             self.CARD_INTEREST_RATE_INPUT.format(index=index)
         )
-        send_keys_recursive(interest_rate, card.interest_rate)
+        send_keys_fast(interest_rate, card.interest_rate)
         min_payment = self.driver.get_element_by_id(
             self.CARD_MIN_PAYMENT_INPUT.format(index=index)
         )
-        send_keys_recursive(min_payment, card.min_monthly_payment)
+        send_keys_fast(min_payment, card.min_monthly_payment)
         if card.promo_details:
             self.add_credit_card_with_promo_rate(index=index, card=card)
 
+    @timed_action
     def add_loan(self, index: int, loan: Loan):
         """Adding basic loan"""
         self.select_loan_type(index, 4)
         lender_name_input = self.driver.get_element_by_id(
             self.OTHER_LOAN_LENDER_NAME_INPUT.format(index=index)
         )
-        send_keys_recursive(lender_name_input, loan.lender_name)
+        send_keys_fast(lender_name_input, loan.lender_name)
         loan_balance_input = self.driver.get_element_by_id(
             self.OTHER_LOAN_BALANCE_INPUT.format(index=index)
         )
-        send_keys_recursive(loan_balance_input, loan.balance)
+        send_keys_fast(loan_balance_input, loan.balance)
         interest_rate = self.driver.get_element_by_id(
             self.OTHER_LOAN_INTEREST_RATE_INPUT.format(index=index)
         )
-        send_keys_recursive(interest_rate, loan.interest_rate)
+        send_keys_fast(interest_rate, loan.interest_rate)
         monthly_payment = self.driver.get_element_by_id(
             self.OTHER_LOAN_MONTHLY_PAYMENT_INPUT.format(index=index)
         )
-        send_keys_recursive(monthly_payment, loan.min_monthly_payment)
-        if loan.deductible:
+        send_keys_fast(monthly_payment, loan.min_monthly_payment)
+        if loan.tax_deductible:
             tax_deductible_option = self.driver.driver.find_element_by_xpath(
                 self.OTHER_LOAN_TAX_DEDUCTIBLE_RADIO_OPTION.format(index=index)
             )
             self.close_promo()
             tax_deductible_option.click()
 
+    @timed_action
     def add_credit_card_with_promo_rate(self, index: int, card: Loan):
         """Adding card with special promo rate."""
         promo_option = self.driver.driver.find_element_by_xpath(
@@ -335,31 +329,34 @@ class Calculator(BasePage):
         intro_rate = self.driver.get_element_by_id(
             self.CARD_PROMO_RATE.format(index=index)
         )
-        send_keys_recursive(intro_rate, card.promo_details.promo_rate)
+        send_keys_fast(intro_rate, card.promo_details.promo_rate)
         date_picker = self.driver.driver.find_element_by_xpath(
             self.CARD_PROMO_END_DATE.format(index=index)
         )
-        date_picker.click()
-        DatePicker(webdriver=self.driver, date=card.promo_details.end_date)
+        DatePicker(
+            webdriver=self.driver, date=card.promo_details.end_date, element=date_picker
+        )
 
+    @timed_action
     def add_windfalls(self, index: int, windfall: Windfall):
         """If windfalls add them"""
         self.select_additional_income_type(index=index, income_type="Windfall")
         monthly_amount_input = self.driver.get_element_by_id(
             self.ADDITIONAL_INCOME_MONTHLY_AMOUNT.format(index=index)
         )
-        send_keys_recursive(monthly_amount_input, windfall.amount)
+        send_keys_fast(monthly_amount_input, windfall.amount)
         date_picker = self.driver.driver.find_element_by_xpath(
             self.ADDITIONAL_INCOME_WINDFALL_DATE.format(index=index + 1)
         )
-        date_picker.click()
-        DatePicker(webdriver=self.driver, date=windfall.date)
+        DatePicker(webdriver=self.driver, date=windfall.date, element=date_picker)
 
+    @timed_action
     def press_calculate(self):
         button = self.driver.driver.find_element_by_css_selector(self.CALCULATE_BUTTON)
         button.click()
         self.driver.wait_for_element_to_be_present(By.XPATH, self.RESULTS_DIV)
 
+    @timed_action
     def generate_plan(self, page_name: str):
         """Save Results table to file."""
         self.press_calculate()
@@ -369,7 +366,10 @@ class Calculator(BasePage):
             LOGGER.info(f"Saving {page_name}.html")
             web_page.write(str(results_html))
 
+    @timed_action
     def close_promo(self):
+        if getattr(self.driver, "promo_suppressed", False):
+            return
         try:
             promo_button = self.driver.get_element_by_css("button[title='Close']")
             if promo_button:
@@ -0,0 +1,317 @@
+"""
+    Penny exact version of the batch engine. Amounts are int64 cents and
+    rates basis points straight from the parsed config, every month's
+    interest is rounded half up to the cent the way lenders post it, so
+    a 30 year plan reconciles with statements instead of drifting. The
+    arithmetic runs on N x M int64 arrays; reference_plan does the same
+    month by month with Decimal and verify() checks both agree.
+"""
+import argparse
+import json
+import logging
+import os
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from amortization import MAX_MONTHS
+from batch_amortization import BatchResult
+from models import NO_PROMO, PlanConfig, month_of
+
+
+LOG = logging.getLogger(__name__)
+
+# basis points of APR to a monthly fraction: 12 months * 10000
+MONTHLY_BP = 120000
+CENT = Decimal("0.01")
+
+
+def monthly_interest(balances: np.ndarray, rates: np.ndarray) -> np.ndarray:
+    """Interest in cents on cent balances at bp APR, rounded half up"""
+    return (2 * balances * rates + MONTHLY_BP) // (2 * MONTHLY_BP)
+
+
+class CentsBatch:
+    """
+        N portfolios of at most M debts as int64 cents and basis points,
+        padding debts have a zero balance
+    """
+
+    def __init__(self, config_count: int, debts: int, windfalls: int):
+        shape = (config_count, debts)
+        self.balances = np.zeros(shape, dtype=np.int64)
+        self.rates = np.zeros(shape, dtype=np.int64)
+        self.promo_rates = np.zeros(shape, dtype=np.int64)
+        self.promo_ends = np.zeros(shape, dtype=np.int64)
+        self.min_payments = np.zeros(shape, dtype=np.int64)
+        self.promo_min_payments = np.zeros(shape, dtype=np.int64)
+        self.deductible = np.zeros(shape, dtype=bool)
+        self.budgets = np.zeros(config_count, dtype=np.int64)
+        self.tax_rates = np.zeros(config_count, dtype=np.int64)
+        self.windfall_months = np.zeros((config_count, windfalls), dtype=np.int64)
+        self.windfall_amounts = np.zeros((config_count, windfalls), dtype=np.int64)
+
+    def __len__(self):
+        return self.balances.shape[0]
+
+    @classmethod
+    def from_configs(cls, configs: Iterable[dict], start: date = None):
+        """Pack loaded plan_configs json, parsed with PlanConfig"""
+        start = (start or date.today()).replace(day=1)
+        start_month = month_of(start)
+        parsed = [PlanConfig.from_json(config) for config in configs]
+        landed = [
+            [w for w in config.windfalls if w.month >= start_month] for config in parsed
+        ]
+        batch = cls(
+            len(parsed),
+            max([len(config.loans) for config in parsed], default=0),
+            max([len(windfalls) for windfalls in landed], default=0),
+        )
+        for n, (config, windfalls) in enumerate(zip(parsed, landed)):
+            columns = config.loans.columns()
+            m = len(config.loans)
+            promo_end = columns["promo_end_month"]
+            batch.balances[n, :m] = columns["balance_cents"]
+            batch.rates[n, :m] = columns["rate_bp"]
+            batch.promo_rates[n, :m] = columns["promo_rate_bp"]
+            batch.promo_ends[n, :m] = np.where(
+                promo_end == NO_PROMO, 0, promo_end - start_month + 1
+            )
+            batch.min_payments[n, :m] = columns["min_payment_cents"]
+            batch.promo_min_payments[n, :m] = columns["promo_min_payment_cents"]
+            batch.deductible[n, :m] = columns["tax_deductible"]
+            for w, windfall in enumerate(windfalls):
+                batch.windfall_months[n, w] = windfall.month - start_month + 1
+                batch.windfall_amounts[n, w] = windfall.amount_cents
+            batch.budgets[n] = (
+                int(columns["min_payment_cents"].sum()) + config.budget_savings_cents
+            )
+            batch.tax_rates[n] = config.tax_rate_bp
+        return batch
+
+
+def _pay_in_order(balances: np.ndarray, cash: np.ndarray, order: np.ndarray):
+    """Pay (portfolios x debts) balances rank by rank until cash runs out"""
+    rows = np.arange(balances.shape[0])
+    for debts in order.T:
+        payment = np.minimum(balances[rows, debts], cash)
+        balances[rows, debts] -= payment
+        cash -= payment
+
+
+def simulate_cents(
+    batch: CentsBatch, strategy: str = "avalanche", max_months: int = MAX_MONTHS
+) -> BatchResult:
+    """
+        Same rules as amortization.pay_month in integer cents. Avalanche
+        compares after tax rates exactly as rate_bp * (10000 - tax_bp),
+        ties go to the smaller balance and then the earlier debt.
+        The result's interest is in cents.
+    """
+    count, debts = batch.balances.shape
+    payoff_months = np.where(batch.balances > 0, -1, 0)
+    interest_paid = np.zeros((count, debts), dtype=np.int64)
+
+    # finished portfolios are dropped from these rows as the plan goes on
+    live = np.arange(count)
+    rows = {
+        "balances": batch.balances.copy(),
+        "promo_ends": batch.promo_ends,
+        "promo_rates": batch.promo_rates,
+        "rates": batch.rates,
+        "promo_minimums": batch.promo_min_payments,
+        "minimums": batch.min_payments,
+        "tax_discount": np.where(
+            batch.deductible, 10000 - batch.tax_rates[:, None], 10000
+        ),
+        "budgets": batch.budgets,
+        "windfall_months": batch.windfall_months,
+        "windfall_amounts": batch.windfall_amounts,
+        "payoffs": payoff_months.copy(),
+        "interest": interest_paid.copy(),
+    }
+
+    month = 0
+    for month in range(1, max_months + 1):
+        active = rows["balances"] > 0
+        running = active.any(axis=1)
+        if not running.any():
+            month -= 1
+            break
+        if running.sum() < 0.75 * len(live):
+            payoff_months[live] = rows["payoffs"]
+            interest_paid[live] = rows["interest"]
+            keep = np.flatnonzero(running)
+            live, active = live[keep], active[keep]
+            rows = {name: values[keep] for name, values in rows.items()}
+        balances = rows["balances"]
+
+        promo = month <= rows["promo_ends"]
+        rates = np.where(promo, rows["promo_rates"], rows["rates"])
+        interest = monthly_interest(balances, rates) * active
+        balances += interest
+        rows["interest"] += interest
+
+        cash = rows["budgets"].copy()
+        if rows["windfall_months"].size:
+            landed = rows["windfall_months"] == month
+            cash += (rows["windfall_amounts"] * landed).sum(axis=1)
+        minimums = np.where(promo, rows["promo_minimums"], rows["minimums"])
+        due = np.minimum(balances, minimums)
+        if (due.sum(axis=1) <= cash).all():
+            balances -= due
+            cash -= due.sum(axis=1)
+        else:
+            # not every minimum can be met, pay them in debt order
+            for debt in range(debts):
+                payment = np.minimum(due[:, debt], cash)
+                balances[:, debt] -= payment
+                cash -= payment
+
+        if strategy == "snowball":
+            order = np.argsort(balances, axis=1, kind="stable")
+        else:
+            order = np.lexsort((balances, -rates * rows["tax_discount"]), axis=1)
+        _pay_in_order(balances, cash, order)
+        payoffs = rows["payoffs"]
+        payoffs[(payoffs < 0) & (balances <= 0)] = month
+
+    payoff_months[live] = rows["payoffs"]
+    interest_paid[live] = rows["interest"]
+    if (payoff_months < 0).any():
+        LOG.warning(f"Some debts not paid off within {max_months} months")
+    return BatchResult(payoff_months, interest_paid, month)
+
+
+def reference_plan(
+    config: PlanConfig,
+    start: date = None,
+    strategy: str = "avalanche",
+    max_months: int = MAX_MONTHS,
+) -> Tuple[List[Optional[int]], List[int]]:
+    """
+        Payoff month (None if never) and interest in cents per debt,
+        computed one debt and one month at a time with Decimal dollars
+    """
+    start_month = month_of((start or date.today()).replace(day=1))
+    loans = list(config.loans)
+    balances = [Decimal(loan.balance_cents) / 100 for loan in loans]
+    interest_paid = [Decimal(0)] * len(loans)
+    payoff: List[Optional[int]] = [None if b > 0 else 0 for b in balances]
+    budget = (
+        sum(Decimal(loan.min_payment_cents) for loan in loans)
+        + config.budget_savings_cents
+    ) / 100
+    tax = Decimal(config.tax_rate_bp) / 10000
+
+    def terms(loan, month: int) -> Tuple[Decimal, Decimal]:
+        promo = loan.promo_details
+        if promo and month <= promo.end_month - start_month + 1:
+            return (
+                Decimal(promo.promo_rate_bp) / 100,
+                Decimal(promo.minimum_monthly_payment_cents) / 100,
+            )
+        return (
+            Decimal(loan.regular_rate_bp) / 100,
+            Decimal(loan.min_payment_cents) / 100,
+        )
+
+    for month in range(1, max_months + 1):
+        if all(b <= 0 for b in balances):
+            break
+        cash = budget + sum(
+            (
+                Decimal(w.amount_cents) / 100
+                for w in config.windfalls
+                if w.month - start_month + 1 == month
+            ),
+            Decimal(0),
+        )
+        rates = []
+        for i, loan in enumerate(loans):
+            rate, _ = terms(loan, month)
+            rates.append(rate)
+            if balances[i] > 0:
+                interest = (balances[i] * rate / 1200).quantize(CENT, ROUND_HALF_UP)
+                balances[i] += interest
+                interest_paid[i] += interest
+        for i, loan in enumerate(loans):
+            payment = min(balances[i], terms(loan, month)[1], cash)
+            balances[i] -= payment
+            cash -= payment
+        if strategy == "snowball":
+            order = sorted(range(len(loans)), key=lambda i: balances[i])
+        else:
+            order = sorted(
+                range(len(loans)),
+                key=lambda i: (
+                    -rates[i] * (1 - tax if loans[i].tax_deductible else 1),
+                    balances[i],
+                ),
+            )
+        for i in order:
+            payment = min(balances[i], cash)
+            balances[i] -= payment
+            cash -= payment
+        for i, balance in enumerate(balances):
+            if payoff[i] is None and balance <= 0:
+                payoff[i] = month
+    return payoff, [int(total * 100) for total in interest_paid]
+
+
+def verify(
+    configs: Iterable[dict], start: date = None, strategy: str = "avalanche"
+) -> List[str]:
+    """Differences between simulate_cents and reference_plan, empty when exact"""
+    configs = list(configs)
+    result = simulate_cents(CentsBatch.from_configs(configs, start), strategy)
+    problems = []
+    for n, loaded_json in enumerate(configs):
+        payoff, interest = reference_plan(
+            PlanConfig.from_json(loaded_json), start, strategy
+        )
+        m = len(payoff)
+        fast_payoff = [None if p < 0 else p for p in result.payoff_months[n, :m]]
+        fast_interest = result.interest[n, :m].tolist()
+        if fast_payoff != payoff or fast_interest != interest:
+            problems.append(
+                f"config {n}: payoffs {fast_payoff} vs {payoff}, "
+                f"interest {fast_interest} vs {interest}"
+            )
+    return problems
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("config_dir", nargs="?", default="plan_configs")
+    parser.add_argument(
+        "--strategy", choices=("avalanche", "snowball"), default="avalanche"
+    )
+    parser.add_argument(
+        "--start", type=date.fromisoformat, default=None, help="yyyy-mm-dd"
+    )
+    parser.add_argument(
+        "--verify", action="store_true", help="check against the Decimal reference"
+    )
+    args = parser.parse_args()
+
+    names = sorted(n for n in os.listdir(args.config_dir) if n.endswith(".json"))
+    loaded = []
+    for name in names:
+        with open(os.path.join(args.config_dir, name), "r") as loan_json:
+            loaded.append(json.load(loan_json))
+    if args.verify:
+        mismatches = verify(loaded, args.start, args.strategy)
+        for mismatch in mismatches:
+            LOG.error(mismatch)
+        LOG.info(f"{len(loaded) - len(mismatches)}/{len(loaded)} configs exact")
+        raise SystemExit(1 if mismatches else 0)
+    cents = simulate_cents(CentsBatch.from_configs(loaded, args.start), args.strategy)
+    for name, months, total in zip(names, cents.debt_free_months, cents.total_interest):
+        LOG.info(
+            f"{name[:-len('.json')]}: {months} months, {total / 100:,.2f} interest"
+        )
@@ -9,6 +9,7 @@ from datetime import datetime
 from wrapped_driver import WrappedDriver
 
 from calculator_page import Calculator, loan_types, Windfall, Loans
+from instrumentation import StepMetrics
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,8 +20,9 @@ LOGGER = logging.getLogger(__name__)
 
 
 class CalculatorClient:
-    def __init__(self, plan_name: str, user_json: dict):
+    def __init__(self, plan_name: str, user_json: dict, metrics: StepMetrics = None):
         self.plan_name = plan_name
+        self.metrics = metrics
         self.user_loans = Loans(user_json.get("loans"))
         self.loan_count = str(len(self.user_loans))
         self.user_info = user_json.get("user")
@@ -30,9 +32,15 @@ class CalculatorClient:
         self.windfalls = [Windfall(**wf) for wf in user_json.get("windfalls")]
         LOGGER.info("Instantiated CalculatorClient")
 
-    def __call__(self, webdriver: WrappedDriver, *args, **kwargs):
-        self.calculator = Calculator(webdriver=webdriver)
-        self.calculator.open_calculator()
+    def __call__(self, webdriver: WrappedDriver, pooled: bool = False, *args, **kwargs):
+        """
+            pooled drivers come from a DriverPool already on a clean
+            calculator page and are left open for the next plan
+        """
+        self.pooled = pooled
+        self.calculator = Calculator(webdriver=webdriver, metrics=self.metrics)
+        if not pooled:
+            self.calculator.open_calculator()
         self.calculator.declare_number_of_debts(debts=self.loan_count)
         for count, user_loan in enumerate(self.user_loans):
             LOGGER.info(f"Loan: {user_loan}")
@@ -58,7 +66,8 @@ class CalculatorClient:
         self.calculator.generate_plan(
             page_name=f"{self.plan_name}-{self.budget_cuts}-savings"
         )
-        self.calculator.driver.quit_driver()
+        if not self.pooled:
+            self.calculator.driver.quit_driver()
 
 
 if __name__ == "__main__":
@@ -7,14 +7,24 @@
     details and generate a new plan. Based on outcomes of my tweaks
     I could then take action on the plan that has the best outcome.
 """
+import argparse
 import logging
 import json
 import os
 import sys
+import time
+from contextlib import nullcontext
 from typing import List
 
 import requests
-from bs4 import BeautifulSoup
+
+from view_state import EVENT_VALIDATION, VIEW_STATE, hidden_fields, parsed_page
+from instrumentation import StepMetrics, step_name
+from models import Loan, Loans, Promotion, Windfall  # noqa: F401 re-exported
+from replay_server import SessionRecorder
+from scheduler import BATCH
+from transport import ACCEPT_ENCODING, Transport, default_transport
+from view_state_cache import ViewStateCache
 
 
 logging.basicConfig(
@@ -49,78 +59,6 @@ tax_brackets = {
 }
 
 
-class Windfall:
-    """
-        Cash 'windfalls': Any one-time events that will
-        increase the cash you have in a given month
-    """
-
-    def __init__(self, amount: str, date: str):
-        self.amount = amount
-        self.date = date
-
-
-class Promotion:
-    """
-        Credit Card Promotion Details
-    """
-
-    def __init__(
-        self,
-        regular_rate,
-        promo_rate,
-        end_date: str,
-        minimum_monthly_payment,
-        promo_type: str,
-    ):
-        self.regular_rate = regular_rate
-        self.promo_rate = promo_rate
-        self.end_date = end_date
-        self.minimum_monthly_payment = minimum_monthly_payment
-        self.promo_type = promo_type
-
-
-class Loan:
-    """
-        Loan or Credit Card
-    """
-
-    def __init__(
-        self,
-        lender_name: str,
-        interest_rate,
-        balance,
-        min_monthly_payment,
-        loan_type,
-        promo: dict = None,
-        deductible: str = "1",
-    ):
-        self.lender_name = lender_name
-        self.interest_rate = interest_rate
-        self.balance = balance
-        self.min_monthly_payment = min_monthly_payment
-        self.loan_type = loan_type
-        self.promo = promo
-        self.deductible = deductible
-
-    @property
-    def promo_details(self) -> Promotion:
-        if self.promo:
-            return Promotion(**self.promo)
-
-
-class Loans:
-    def __init__(self, loans: List[Loan]):
-        self.loans = loans
-
-    def __len__(self):
-        return len(self.loans)
-
-    def __iter__(self) -> Loan:
-        for loan in self.loans:
-            yield Loan(**loan)
-
-
 class DebtCalculatorClient:
     """
         Client used to interact with the debt-pay-down-calculator.aspx
@@ -137,12 +75,19 @@ class DebtCalculatorClient:
         number_of_debts: int,
         user_info: dict,
         windfalls: List[Windfall],
+        cache: ViewStateCache = None,
+        rate_limiter=None,
+        url: str = None,
+        recorder=None,
+        metrics: StepMetrics = None,
+        transport: Transport = None,
     ):
-        self.session = requests.Session()
+        self.transport = transport or default_transport()
+        self.session = self.transport.session()
         self.headers = {
             "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,"
             "image/webp,image/apng,*/*;q=0.8",
-            "accept-encoding": "gzip, deflate, br",
+            "accept-encoding": ACCEPT_ENCODING,
             "accept-language": "en-US,en;q=0.9",
             "path": "/calculators/managing-debt/debt-pay-down-calculator.aspx",
             "upgrade-insecure-requests": "1",
@@ -157,6 +102,15 @@ class DebtCalculatorClient:
         self.future_raises = user_info.get("raises")
         self.windfalls = windfalls
         self.view_state = None
+        self.event_validation = None
+        self.cache = cache
+        self.step_key = None
+        self.resuming = cache is not None
+        self.rate_limiter = rate_limiter
+        self.recorder = recorder
+        self.metrics = metrics
+        if url:
+            self.url = url
         self.declare_number_of_debts()
 
     def __enter__(self):
@@ -185,24 +139,78 @@ class DebtCalculatorClient:
         self.generate_plan()
         LOG.info("Debt Pay Down Plan Generated")
 
-    def submit_request(self, params) -> requests.Response:
+    def submit_request(self, params, cacheable: bool = True) -> requests.Response:
         """
             Just a wrapper for posting requests
-        """
-        params.update({"__VIEWSTATE": self.view_state})
-        post_response = self.session.post(self.url, data=params, headers=self.headers)
-        self.view_state = get_view_state(post_response)
+
+            With a ViewStateCache, steps whose inputs (and every input
+            before them) were posted on an earlier run are skipped and
+            return None, posting resumes from the first step not cached.
+        """
+        if self.cache:
+            self.step_key = self.cache.step_key(self.url, self.step_key, params)
+            if cacheable and self.resuming:
+                cached = self.cache.get(self.step_key)
+                if cached is not None:
+                    self.view_state = cached.view_state
+                    self.event_validation = cached.event_validation
+                    return None
+                self.resuming = False
+        if self.view_state is None:
+            self._exchange()
+        params.update({VIEW_STATE: self.view_state})
+        if self.event_validation:
+            params.update({EVENT_VALIDATION: self.event_validation})
+        post_response = self._exchange(params)
+        if self.cache and cacheable:
+            self.cache.set(self.step_key, self.view_state, self.event_validation)
         # save_page(post_response, "submit-request")
         return post_response
 
+    def _exchange(self, params: dict = None) -> requests.Response:
+        """
+            GET the calculator page (no params) or POST a step and pick up
+            the hidden fields of the response
+        """
+        method = "GET" if params is None else "POST"
+        started = time.perf_counter()
+        response, retries = self.transport.request(
+            self.session,
+            method,
+            self.url,
+            data=params,
+            headers=self.headers,
+            rate_limiter=self.rate_limiter,
+        )
+        received = time.perf_counter()
+        fields = hidden_fields(response, (VIEW_STATE, EVENT_VALIDATION))
+        parsed = time.perf_counter()
+        if fields.get(VIEW_STATE):
+            self.view_state = fields[VIEW_STATE]
+            self.event_validation = fields.get(EVENT_VALIDATION)
+        else:
+            # keep the last good state so the next step can still be posted
+            LOG.warning(f"No view state in {response.status_code} response")
+        if self.recorder:
+            self.recorder.record(method, params, response, fields.get(VIEW_STATE))
+        if self.metrics:
+            self.metrics.record(
+                step_name(params),
+                latency=received - started,
+                request_bytes=len(response.request.body or ""),
+                response_bytes=len(response.content),
+                view_state_bytes=len(self.view_state or ""),
+                parse_seconds=parsed - received,
+                status=response.status_code,
+                retries=retries,
+            )
+        return response
+
     def declare_number_of_debts(self):
         """
             First question:
             How many debts do you want to include in your plan?
         """
-        self.view_state = get_view_state(
-            self.session.get(self.url, headers=self.headers)
-        )
         params = {
             "ctl00$well$defaultUC$isValid": "DEFAULT",
             "ctl00$well$defaultUC$debts": self.loan_count,
@@ -403,35 +411,178 @@ class DebtCalculatorClient:
             "ctl00$well$defaultUC$isValid": "",
             "ctl00$well$defaultUC$SubmitNOMTP": "Get Plan",
         }
-        response = self.submit_request(params=params)
+        response = self.submit_request(params=params, cacheable=False)
         save_page(page_response=response, page_name=self.plan_name)
 
 
 def save_page(page_response: requests.Response, page_name: str):
-    soup = BeautifulSoup(page_response.content, "html.parser")
+    soup = parsed_page(page_response)
     with open(f"plans/{page_name}.html", "w") as web_page:
         web_page.write(str(soup.select_one("div.calculator")))
 
 
 def get_view_state(page_response: requests.Response) -> str:
-    soup = BeautifulSoup(page_response.content, "html.parser")
-    return soup.select_one("input#__VIEWSTATE").attrs.get("value")
+    return hidden_fields(page_response).get(VIEW_STATE)
+
+
+def run_plan(plan_name: str, loaded_json: dict, backend: str = "http", **options):
+    """
+        Generate one plan from a loaded config with the chosen backend:
+            * http      DebtCalculatorClient posting to bankrate.com
+            * selenium  CalculatorClient driving the page in a browser
+            * local     amortization engine, no network at all
+
+        http options: cache, url (e.g. a local ReplayServer), a scheduler
+        to run the conversation under at a priority (scheduler.BATCH by
+        default) or a bare rate_limiter,
+        transport (timeouts, retries and the shared connection pool) and
+        record_dir to save the conversation as a replay fixture,
+        metrics (a StepMetrics) is filled by the http and selenium backends,
+        selenium takes chrome_driver_path and lean (block assets and the
+        promo) or a driver_pool of warm drivers. With a store (PlanStore)
+        the plan goes into the database instead of a file in plans/
+    """
+    user_loans = Loans(loaded_json.get("loans"))
+    user_windfalls = [Windfall(**wf) for wf in loaded_json.get("windfalls")]
+    user = loaded_json.get("user")
+
+    if backend == "local":
+        from amortization import save_plan, simulate
+
+        plan = simulate(user_loans, user_windfalls, user)
+        if options.get("store"):
+            from plan_parser import parse_local_plan
+
+            options["store"].add(
+                parse_local_plan(plan.to_dict(), plan_name), loaded_json, backend
+            )
+        else:
+            save_plan(plan=plan, page_name=plan_name)
+        LOG.info("Debt Pay Down Plan Generated")
+        return plan
+
+    if backend == "selenium":
+        from wrapped_driver import WrappedDriver
+        from client import CalculatorClient
+
+        client = CalculatorClient(
+            plan_name=plan_name, user_json=loaded_json, metrics=options.get("metrics")
+        )
+        driver_pool = options.get("driver_pool")
+        if driver_pool:
+            with driver_pool.lease() as driver:
+                client(webdriver=driver, pooled=True)
+        else:
+            driver = WrappedDriver(
+                chrome_driver_path=options.get("chrome_driver_path"), browser="headless"
+            )
+            if options.get("lean"):
+                from lean_browser import make_lean
+
+                make_lean(driver)
+            client(webdriver=driver)
+        _store_page(
+            options.get("store"),
+            f"plans/{plan_name}-{user.get('budget_savings')}-savings.html",
+            loaded_json,
+            backend,
+        )
+        return
+
+    recorder = SessionRecorder() if options.get("record_dir") else None
+    scheduler = options.get("scheduler")
+    conversation = (
+        scheduler.conversation(options.get("priority", BATCH))
+        if scheduler
+        else nullcontext(options.get("rate_limiter"))
+    )
+    with conversation as rate_limiter, DebtCalculatorClient(
+        plan_name=plan_name,
+        number_of_debts=len(user_loans),
+        user_info=user,
+        windfalls=user_windfalls,
+        cache=options.get("cache"),
+        rate_limiter=rate_limiter,
+        url=options.get("url"),
+        recorder=recorder,
+        metrics=options.get("metrics"),
+        transport=options.get("transport"),
+    ) as debt_calculator:
+        for user_loan in user_loans:
+            debt_calculator.add_loan(loan=user_loan)
+    if recorder:
+        recorder.save(os.path.join(options["record_dir"], f"{plan_name}.json"))
+    _store_page(options.get("store"), f"plans/{plan_name}.html", loaded_json, backend)
+
+
+def _store_page(store, path: str, loaded_json: dict, backend: str):
+    """Move a saved results page into the plan store"""
+    if store:
+        store.add_file(path, loaded_json, backend)
+        os.remove(path)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--backend", choices=("http", "selenium", "local"), default="http"
+    )
+    parser.add_argument("--chrome-driver-path", default=None)
+    parser.add_argument(
+        "--view-state-cache",
+        default=None,
+        help="directory to cache view states in so re-runs skip unchanged steps",
+    )
+    parser.add_argument("--url", default=None, help="calculator url to post to")
+    parser.add_argument(
+        "--record-dir", default=None, help="save each conversation as a fixture"
+    )
+    parser.add_argument(
+        "--metrics", default=None, help="per step metrics file (.json or .prom)"
+    )
+    parser.add_argument(
+        "--store", default=None, help="SQLite plan store to save plans to"
+    )
+    parser.add_argument("--connect-timeout", type=float, default=5.0)
+    parser.add_argument("--read-timeout", type=float, default=30.0)
+    parser.add_argument(
+        "--retries", type=int, default=3, help="retries of a failed http request"
+    )
+    parser.add_argument(
+        "--store-html", action="store_true", help="keep compressed html in the store"
+    )
+    args = parser.parse_args()
+    cache = ViewStateCache(args.view_state_cache) if args.view_state_cache else None
+    step_metrics = StepMetrics() if args.metrics else None
+    transport = Transport(
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        retries=args.retries,
+    )
 
-    for plan in os.listdir("plan_configs"):
-        with open(f"plan_configs/{plan}", "r") as loan_json:
-            loaded_json = json.load(loan_json)
-            user_loans = Loans(loaded_json.get("loans"))
-            user_windfalls = [Windfall(**wf) for wf in loaded_json.get("windfalls")]
-            user = loaded_json.get("user")
-
-        with DebtCalculatorClient(
-            plan_name=plan.replace(".json", ""),
-            number_of_debts=len(user_loans),
-            user_info=user,
-            windfalls=user_windfalls,
-        ) as debt_calculator:
-            for user_loan in user_loans:
-                debt_calculator.add_loan(loan=user_loan)
+    plan_store = None
+    if args.store:
+        from plan_store import PlanStore
+
+        plan_store = PlanStore(args.store, keep_html=args.store_html)
+
+    with plan_store.transaction() if plan_store else nullcontext():
+        for plan in os.listdir("plan_configs"):
+            with open(f"plan_configs/{plan}", "r") as loan_json:
+                loaded_json = json.load(loan_json)
+
+            run_plan(
+                plan_name=plan.replace(".json", ""),
+                loaded_json=loaded_json,
+                backend=args.backend,
+                chrome_driver_path=args.chrome_driver_path,
+                cache=cache,
+                url=args.url,
+                record_dir=args.record_dir,
+                metrics=step_metrics,
+                store=plan_store,
+                transport=transport,
+            )
+
+    if step_metrics:
+        step_metrics.dump(args.metrics)
@@ -0,0 +1,175 @@
+"""
+    Pool of headless WrappedDriver sessions kept open across plans. Each
+    driver loads the calculator once, gets reset with "Start over" (or a
+    reload) after every plan, is health checked before being handed out
+    and recycled after max_uses plans.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Deque, List
+
+from selenium.common.exceptions import WebDriverException
+
+from wrapped_driver import WrappedDriver
+
+from batch import PlanResult
+from calculator_page import Calculator
+from lean_browser import make_lean
+
+
+LOG = logging.getLogger(__name__)
+
+
+class PooledDriver:
+    def __init__(self, driver: WrappedDriver):
+        self.driver = driver
+        self.uses = 0
+
+
+class DriverPool:
+    """Hands out warm drivers sitting on a clean calculator page"""
+
+    def __init__(
+        self,
+        size: int,
+        chrome_driver_path: str = None,
+        driver_factory: Callable[[], WrappedDriver] = None,
+        max_uses: int = 25,
+        lean: bool = False,
+    ):
+        """lean drivers block assets and suppress the promo, see make_lean"""
+        self.size = size
+        self.max_uses = max_uses
+        self.lean = lean
+        self.driver_factory = driver_factory or (
+            lambda: WrappedDriver(
+                chrome_driver_path=chrome_driver_path, browser="headless"
+            )
+        )
+        # guards idle and created, notified whenever a driver or a slot frees
+        self.condition = threading.Condition()
+        self.idle: Deque[PooledDriver] = deque()
+        self.created = 0
+        self.closed = False
+
+    def _new_driver(self) -> PooledDriver:
+        driver = self.driver_factory()
+        if self.lean:
+            make_lean(driver)
+        Calculator(webdriver=driver).open_calculator()
+        return PooledDriver(driver)
+
+    @staticmethod
+    def _healthy(pooled: PooledDriver) -> bool:
+        try:
+            return bool(pooled.driver.driver.current_url)
+        except WebDriverException:
+            return False
+
+    @staticmethod
+    def _quit(pooled: PooledDriver):
+        try:
+            pooled.driver.quit_driver()
+        except WebDriverException:
+            LOG.warning("Driver did not quit cleanly")
+
+    def _take(self) -> PooledDriver:
+        """Idle driver, else a new one while under size, else wait for either"""
+        with self.condition:
+            while not self.closed and not self.idle and self.created >= self.size:
+                self.condition.wait()
+            if self.closed:
+                raise RuntimeError("Driver pool is closed")
+            pooled = self.idle.popleft() if self.idle else None
+            if pooled is None:
+                self.created += 1
+        if pooled is not None:
+            if pooled.uses < self.max_uses and self._healthy(pooled):
+                return pooled
+            LOG.info(f"Recycling driver after {pooled.uses} plans")
+            self._quit(pooled)
+        try:
+            return self._new_driver()
+        except Exception:
+            self._release()
+            raise
+
+    def _release(self):
+        """Give up the slot of a driver that was quit or never started"""
+        with self.condition:
+            self.created -= 1
+            self.condition.notify()
+
+    def _give_back(self, pooled: PooledDriver):
+        """Back to the idle drivers, or quit once the pool is closed"""
+        with self.condition:
+            if not self.closed:
+                self.idle.append(pooled)
+                self.condition.notify()
+                return
+        self._quit(pooled)
+        self._release()
+
+    @contextmanager
+    def lease(self) -> WrappedDriver:
+        """
+            Borrow a driver for one plan, it is reset and returned to the
+            pool afterwards or replaced if the plan broke it
+        """
+        pooled = self._take()
+        try:
+            yield pooled.driver
+            pooled.uses += 1
+            Calculator(webdriver=pooled.driver).start_over()
+        except Exception:
+            self._quit(pooled)
+            pooled = None
+            raise
+        finally:
+            if pooled is None:
+                self._release()
+            else:
+                self._give_back(pooled)
+
+    def run(self, clients: List) -> List[PlanResult]:
+        """Run a batch of CalculatorClients, one per pooled driver at a time"""
+
+        def run_client(client) -> PlanResult:
+            started = time.perf_counter()
+            try:
+                with self.lease() as driver:
+                    client(webdriver=driver, pooled=True)
+            except Exception as error:
+                LOG.exception(f"Plan {client} failed")
+                return PlanResult(
+                    repr(client), False, time.perf_counter() - started, repr(error)
+                )
+            return PlanResult(repr(client), True, time.perf_counter() - started)
+
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(run_client, clients))
+
+    def quit_idle(self):
+        """Quit the idle drivers, new ones are started as plans need them"""
+        with self.condition:
+            idle, self.idle = list(self.idle), deque()
+            self.created -= len(idle)
+            self.condition.notify_all()
+        for pooled in idle:
+            self._quit(pooled)
+
+    def close(self):
+        """Quit the idle drivers, leased ones are quit when they come back"""
+        with self.condition:
+            self.closed = True
+        self.quit_idle()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,182 @@
+"""
+    Per step instrumentation for the calculator clients. Every submitted
+    step (named by its isValid code) or Selenium action records latency,
+    payload sizes, view state length, parse time, HTTP status and retries
+    into histograms that can be dumped as JSON at the end of a run or
+    written as a Prometheus text file to be scraped.
+"""
+import functools
+import json
+import logging
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+LOG = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, math.inf)
+HISTOGRAMS = {
+    "latency_seconds": SECONDS_BUCKETS,
+    "parse_seconds": SECONDS_BUCKETS,
+    "request_bytes": BYTES_BUCKETS,
+    "response_bytes": BYTES_BUCKETS,
+    "view_state_bytes": BYTES_BUCKETS,
+}
+
+
+def step_name(params: Optional[dict]) -> str:
+    """
+        isValid code of the posted step, steps that post an empty code
+        are named after their submit button (SubmitPT -> PT)
+    """
+    if params is None:
+        return "GET"
+    code = params.get("ctl00$well$defaultUC$isValid")
+    if code:
+        return code
+    for field in params:
+        name = field.rsplit("$", 1)[-1]
+        if name.startswith("Submit"):
+            return name[len("Submit") :]
+    return "UNKNOWN"
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.total += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def to_dict(self) -> dict:
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            cumulative["+Inf" if bound == math.inf else str(bound)] = running
+        return {"count": self.count, "sum": self.total, "buckets": cumulative}
+
+
+class StepMetrics:
+    """Thread safe registry of per step histograms and counters"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms: Dict[str, Dict[str, Histogram]] = defaultdict(dict)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.retries: Counter = Counter()
+
+    def record(
+        self,
+        step: str,
+        latency: float,
+        request_bytes: int = None,
+        response_bytes: int = None,
+        view_state_bytes: int = None,
+        parse_seconds: float = None,
+        status: int = None,
+        retries: int = 0,
+    ):
+        """Add one step event, values left as None were not measured"""
+        event = {
+            "latency_seconds": latency,
+            "request_bytes": request_bytes,
+            "response_bytes": response_bytes,
+            "view_state_bytes": view_state_bytes,
+            "parse_seconds": parse_seconds,
+        }
+        LOG.debug(json.dumps({"step": step, "status": status, **event}))
+        with self.lock:
+            for name, value in event.items():
+                if value is not None:
+                    histograms = self.histograms[step]
+                    if name not in histograms:
+                        histograms[name] = Histogram(HISTOGRAMS[name])
+                    histograms[name].observe(value)
+            if status is not None:
+                self.statuses[step][status] += 1
+            self.retries[step] += retries
+
+    @contextmanager
+    def time(self, step: str):
+        """Record the latency of a block, used for Selenium actions"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(step, time.perf_counter() - started)
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                step: {
+                    **{name: h.to_dict() for name, h in histograms.items()},
+                    "statuses": dict(self.statuses[step]),
+                    "retries": self.retries[step],
+                }
+                for step, histograms in self.histograms.items()
+            }
+
+    def dump(self, path: str):
+        """JSON for .json paths, Prometheus text format for anything else"""
+        with open(path, "w") as metrics_file:
+            if path.endswith(".json"):
+                json.dump(self.to_dict(), metrics_file, indent=2, sort_keys=True)
+            else:
+                metrics_file.write(self.prometheus())
+
+    def prometheus(self) -> str:
+        lines = []
+        metrics = self.to_dict()
+        for name in HISTOGRAMS:
+            metric = f"debt_calculator_step_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            for step, values in sorted(metrics.items()):
+                if name not in values:
+                    continue
+                for bound, count in values[name]["buckets"].items():
+                    lines.append(
+                        f'{metric}_bucket{{step="{step}",le="{bound}"}} {count}'
+                    )
+                lines.append(f'{metric}_sum{{step="{step}"}} {values[name]["sum"]}')
+                lines.append(f'{metric}_count{{step="{step}"}} {values[name]["count"]}')
+        lines.append("# TYPE debt_calculator_step_responses_total counter")
+        for step, values in sorted(metrics.items()):
+            for status, count in sorted(values["statuses"].items()):
+                lines.append(
+                    "debt_calculator_step_responses_total"
+                    f'{{step="{step}",status="{status}"}} {count}'
+                )
+        lines.append("# TYPE debt_calculator_step_retries_total counter")
+        for step, values in sorted(metrics.items()):
+            retries = values["retries"]
+            lines.append(
+                f'debt_calculator_step_retries_total{{step="{step}"}} {retries}'
+            )
+        return "\n".join(lines) + "\n"
+
+
+def timed_action(method):
+    """Record a page object action in self.metrics when it has one"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        metrics = getattr(self, "metrics", None)
+        if metrics is None:
+            return method(self, *args, **kwargs)
+        with metrics.time(method.__name__):
+            return method(self, *args, **kwargs)
+
+    return wrapper
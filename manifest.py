@@ -0,0 +1,179 @@
+"""
+    Manifest of generated plans so runs only rebuild what changed. Every
+    plan is recorded with the canonical hash of its config (see
+    models.config_hash), the backend and the files it produced; a config
+    whose hash, backend and outputs are all still there is skipped. Runs
+    are logged as cold (empty manifest) or warm so both can be compared.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from models import config_hash
+
+
+LOG = logging.getLogger(__name__)
+
+MAX_RUNS = 100
+
+
+def plan_outputs(plan_name: str, loaded_json: dict, backend: str) -> List[str]:
+    """Files a backend writes for a plan, none when it goes to a PlanStore"""
+    if backend == "local":
+        return [f"plans/{plan_name}.json"]
+    if backend == "selenium":
+        budget = (loaded_json.get("user") or {}).get("budget_savings")
+        return [f"plans/{plan_name}-{budget}-savings.html"]
+    return [f"plans/{plan_name}.html"]
+
+
+class Manifest:
+    """Plan name to hash, backend and outputs, saved as json after changes"""
+
+    def __init__(self, path: str = ".plan_manifest.json"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries: Dict[str, dict] = {}
+        self.runs: List[dict] = []
+        if os.path.exists(path):
+            with open(path, "r") as manifest_file:
+                saved = json.load(manifest_file)
+            self.entries, self.runs = saved["plans"], saved["runs"]
+
+    def is_current(self, plan_name: str, digest: str, backend: str) -> bool:
+        entry = self.entries.get(plan_name)
+        return bool(
+            entry
+            and entry["hash"] == digest
+            and entry["backend"] == backend
+            and all(os.path.exists(path) for path in entry["outputs"])
+        )
+
+    def changed(
+        self, configs: Dict[str, dict], backend: str
+    ) -> Tuple[Dict[str, dict], List[str]]:
+        """Split configs into the ones to regenerate and unchanged plan names"""
+        stale, unchanged = {}, []
+        for plan_name, loaded_json in configs.items():
+            try:
+                current = self.is_current(plan_name, config_hash(loaded_json), backend)
+            except ValueError:
+                # invalid configs are run so the failure gets reported
+                current = False
+            if current:
+                unchanged.append(plan_name)
+            else:
+                stale[plan_name] = loaded_json
+        return stale, unchanged
+
+    def record(self, plan_name: str, loaded_json: dict, backend: str, stored=False):
+        """A plan was generated, stored plans have no output files to check"""
+        outputs = [] if stored else plan_outputs(plan_name, loaded_json, backend)
+        with self.lock:
+            self.entries[plan_name] = {
+                "hash": config_hash(loaded_json),
+                "backend": backend,
+                "outputs": outputs,
+                "generated": time.time(),
+            }
+
+    def record_run(self, cold: bool, regenerated: int, skipped: int, seconds: float):
+        with self.lock:
+            self.runs.append(
+                {
+                    "kind": "cold" if cold else "warm",
+                    "regenerated": regenerated,
+                    "skipped": skipped,
+                    "seconds": seconds,
+                    "finished": time.time(),
+                }
+            )
+            del self.runs[:-MAX_RUNS]
+
+    def report(self) -> Dict[str, dict]:
+        """Run count, mean seconds and mean plans regenerated per run kind"""
+        report = {}
+        for kind in ("cold", "warm"):
+            runs = [run for run in self.runs if run["kind"] == kind]
+            if runs:
+                report[kind] = {
+                    "runs": len(runs),
+                    "mean_seconds": sum(r["seconds"] for r in runs) / len(runs),
+                    "mean_regenerated": sum(r["regenerated"] for r in runs) / len(runs),
+                    "mean_skipped": sum(r["skipped"] for r in runs) / len(runs),
+                }
+        return report
+
+    def save(self):
+        with self.lock:
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w") as manifest_file:
+                json.dump(
+                    {"plans": self.entries, "runs": self.runs},
+                    manifest_file,
+                    indent=2,
+                    sort_keys=True,
+                )
+            os.replace(temporary, self.path)
+
+
+def watch(
+    config_dir: str,
+    manifest: Manifest,
+    run: Callable[[str, dict], None],
+    backend: str,
+    interval: float = 1.0,
+    stored: bool = False,
+):
+    """
+        Poll config_dir and regenerate a plan with run(plan_name, loaded_json)
+        whenever its config file changes to something with a new hash
+    """
+    seen: Dict[str, int] = {}
+    LOG.info(f"Watching {config_dir} for changes")
+    while True:
+        for name in sorted(os.listdir(config_dir)):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(config_dir, name)
+            try:
+                modified = os.stat(path).st_mtime_ns
+                if seen.get(name) == modified:
+                    continue
+                seen[name] = modified
+                with open(path, "r") as loan_json:
+                    loaded_json = json.load(loan_json)
+                digest = config_hash(loaded_json)
+            except (OSError, ValueError) as error:
+                # looked at again once the file changes
+                LOG.warning(f"Skipping {name}: {error}")
+                continue
+            plan_name = name[: -len(".json")]
+            if manifest.is_current(plan_name, digest, backend):
+                continue
+            started = time.perf_counter()
+            try:
+                run(plan_name, loaded_json)
+            except Exception:
+                LOG.exception(f"Plan {plan_name} failed")
+                continue
+            manifest.record(plan_name, loaded_json, backend, stored)
+            manifest.save()
+            LOG.info(f"Regenerated {plan_name} in {time.perf_counter() - started:.2f}s")
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--manifest", default=".plan_manifest.json")
+    args = parser.parse_args()
+    for run_kind, stats in Manifest(args.manifest).report().items():
+        print(
+            f"{run_kind}: {stats['runs']} runs, {stats['mean_seconds']:.2f}s mean, "
+            f"{stats['mean_regenerated']:.1f} regenerated and "
+            f"{stats['mean_skipped']:.1f} skipped per run"
+        )
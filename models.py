@@ -0,0 +1,356 @@
+"""
+    Plan config model shared by the HTTP and Selenium clients and the local
+    engines. A config is parsed and validated once into __slots__ objects
+    holding amounts as integer cents, rates as basis points and dates as
+    month indexes (year * 12 + month - 1), next to the original strings
+    the clients post to the calculator.
+"""
+import functools
+import hashlib
+import json
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+
+CREDIT_CARD = "Credit card or retailer charge card"
+LOAN_TYPES = (
+    CREDIT_CARD,
+    "Car, truck, motorcycle, or boat loan",
+    "Home equity loan",
+    "Mortgage",
+    "Other kind of loan",
+)
+PROMO_TYPES = (
+    "A low introductory interest rate that will increase at a later date",
+    "No payments are due until a later date",
+    "No special promotion on this card",
+)
+DATE_FORMAT = "%m/%d/%Y"
+NO_PROMO = -1
+PARSED_CACHE_SIZE = 65536
+
+
+def _decimal(value, field: str) -> Decimal:
+    if value is None:
+        return Decimal(0)
+    try:
+        return Decimal(str(value).replace(",", "").replace("$", "").strip() or "0")
+    except InvalidOperation:
+        raise ValueError(f"{field} {value!r} is not a number")
+
+
+def _memoized(parse):
+    """
+        Cache a parser's results by value type, value and field: a batch
+        of configs repeats the same amounts, rates and dates. Errors are
+        raised again every time and unhashable values aren't cached.
+    """
+    cache = {}
+
+    @functools.wraps(parse)
+    def memoized(value, field: str = None):
+        args = (value,) if field is None else (value, field)
+        key = (type(value), value, field)
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        except TypeError:
+            return parse(*args)
+        result = cache[key] = parse(*args)
+        if len(cache) > PARSED_CACHE_SIZE:
+            cache.clear()
+        return result
+
+    return memoized
+
+
+@_memoized
+def parse_cents(value, field: str = "amount") -> int:
+    """ "3,018.36" -> 301836, more than two decimals is a ValueError"""
+    cents = _decimal(value, field) * 100
+    if cents != cents.to_integral_value():
+        raise ValueError(f"{field} {value!r} has fractions of a cent")
+    return int(cents)
+
+
+@_memoized
+def parse_basis_points(value, field: str = "rate") -> int:
+    """ "6.8" (percent) -> 680, rates finer than 0.01% are a ValueError"""
+    basis_points = _decimal(value, field) * 100
+    if basis_points != basis_points.to_integral_value():
+        raise ValueError(f"{field} {value!r} is finer than a basis point")
+    if basis_points < 0:
+        raise ValueError(f"{field} {value!r} is negative")
+    return int(basis_points)
+
+
+@_memoized
+def parse_month(value: str, field: str = "date") -> int:
+    """ "%m/%d/%Y" date -> month index"""
+    try:
+        when = datetime.strptime(value, DATE_FORMAT)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} {value!r} is not a mm/dd/yyyy date")
+    return month_of(when)
+
+
+def month_of(when: date) -> int:
+    return when.year * 12 + when.month - 1
+
+
+class Promotion:
+    """
+        Credit Card Promotion Details
+    """
+
+    __slots__ = (
+        "regular_rate",
+        "promo_rate",
+        "end_date",
+        "minimum_monthly_payment",
+        "promo_type",
+        "regular_rate_bp",
+        "promo_rate_bp",
+        "end_month",
+        "minimum_monthly_payment_cents",
+    )
+
+    def __init__(
+        self,
+        regular_rate,
+        promo_rate,
+        end_date: str,
+        minimum_monthly_payment,
+        promo_type: str,
+    ):
+        if promo_type not in PROMO_TYPES:
+            raise ValueError(f"Unknown promo_type {promo_type!r}")
+        self.regular_rate = regular_rate
+        self.promo_rate = promo_rate
+        self.end_date = end_date
+        self.minimum_monthly_payment = minimum_monthly_payment
+        self.promo_type = promo_type
+        self.regular_rate_bp = parse_basis_points(regular_rate, "regular_rate")
+        self.promo_rate_bp = parse_basis_points(promo_rate, "promo_rate")
+        self.end_month = parse_month(end_date, "end_date")
+        self.minimum_monthly_payment_cents = parse_cents(
+            minimum_monthly_payment, "minimum_monthly_payment"
+        )
+
+
+class Loan:
+    """
+        Loan or Credit Card
+    """
+
+    __slots__ = (
+        "lender_name",
+        "interest_rate",
+        "balance",
+        "min_monthly_payment",
+        "loan_type",
+        "promo",
+        "deductible",
+        "promo_details",
+        "balance_cents",
+        "rate_bp",
+        "min_payment_cents",
+        "tax_deductible",
+    )
+
+    def __init__(
+        self,
+        lender_name: str,
+        interest_rate,
+        balance,
+        min_monthly_payment,
+        loan_type,
+        promo: dict = None,
+        deductible: str = "1",
+    ):
+        if loan_type not in LOAN_TYPES:
+            raise ValueError(f"{lender_name}: unknown loan_type {loan_type!r}")
+        self.lender_name = lender_name
+        self.interest_rate = interest_rate
+        self.balance = balance
+        self.min_monthly_payment = min_monthly_payment
+        self.loan_type = loan_type
+        self.promo = promo
+        self.deductible = deductible
+        self.promo_details: Optional[Promotion] = Promotion(**promo) if promo else None
+        try:
+            self.balance_cents = parse_cents(balance, "balance")
+            self.rate_bp = parse_basis_points(interest_rate, "interest_rate")
+            self.min_payment_cents = parse_cents(
+                min_monthly_payment, "min_monthly_payment"
+            )
+        except ValueError as error:
+            raise ValueError(f"{lender_name}: {error}")
+        self.tax_deductible = deductible == "1" and loan_type != CREDIT_CARD
+
+    def __repr__(self):
+        return f"<Loan: {self.lender_name} - {self.balance} - {self.loan_type}>"
+
+    @property
+    def regular_rate_bp(self) -> int:
+        """Rate once any promotion is over"""
+        promo = self.promo_details
+        return promo.regular_rate_bp if promo else self.rate_bp
+
+
+class Loans:
+    """Loans parsed once from the config, iterating hands out the same objects"""
+
+    def __init__(self, loans: Iterable[Union[dict, Loan]]):
+        self.loans: List[Loan] = [
+            loan if isinstance(loan, Loan) else Loan(**loan) for loan in loans or ()
+        ]
+
+    def __len__(self):
+        return len(self.loans)
+
+    def __iter__(self):
+        return iter(self.loans)
+
+    def __getitem__(self, index: int) -> Loan:
+        return self.loans[index]
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """
+            Columnar view for bulk computation, one entry per loan. Without
+            a promotion the promo columns repeat the regular terms and
+            promo_end_month is NO_PROMO.
+        """
+        promos = [loan.promo_details for loan in self.loans]
+        return {
+            "balance_cents": np.array(
+                [loan.balance_cents for loan in self.loans], dtype=np.int64
+            ),
+            "rate_bp": np.array(
+                [loan.regular_rate_bp for loan in self.loans], dtype=np.int64
+            ),
+            "min_payment_cents": np.array(
+                [loan.min_payment_cents for loan in self.loans], dtype=np.int64
+            ),
+            "promo_rate_bp": np.array(
+                [
+                    promo.promo_rate_bp if promo else loan.rate_bp
+                    for loan, promo in zip(self.loans, promos)
+                ],
+                dtype=np.int64,
+            ),
+            "promo_min_payment_cents": np.array(
+                [
+                    promo.minimum_monthly_payment_cents
+                    if promo
+                    else loan.min_payment_cents
+                    for loan, promo in zip(self.loans, promos)
+                ],
+                dtype=np.int64,
+            ),
+            "promo_end_month": np.array(
+                [promo.end_month if promo else NO_PROMO for promo in promos],
+                dtype=np.int64,
+            ),
+            "tax_deductible": np.array(
+                [loan.tax_deductible for loan in self.loans], dtype=bool
+            ),
+        }
+
+
+class Windfall:
+    """
+        Cash 'windfalls': Any one-time events that will
+        increase the cash you have in a given month
+    """
+
+    __slots__ = ("amount", "date", "amount_cents", "month")
+
+    def __init__(self, amount: str, date: str):
+        self.amount = amount
+        self.date = date
+        self.amount_cents = parse_cents(amount, "windfall amount")
+        self.month = parse_month(date, "windfall date")
+
+
+class PlanConfig:
+    """A whole plan_configs json, parsed and validated once"""
+
+    __slots__ = (
+        "loans",
+        "windfalls",
+        "user",
+        "tax_bracket",
+        "budget_savings",
+        "raises",
+        "budget_savings_cents",
+        "tax_rate_bp",
+    )
+
+    def __init__(self, loans, windfalls=None, user: dict = None):
+        self.loans = loans if isinstance(loans, Loans) else Loans(loans)
+        self.windfalls = [
+            wf if isinstance(wf, Windfall) else Windfall(**wf) for wf in windfalls or ()
+        ]
+        self.user = user or {}
+        self.tax_bracket = self.user.get("tax_bracket")
+        self.budget_savings = self.user.get("budget_savings")
+        self.raises = self.user.get("raises")
+        self.budget_savings_cents = parse_cents(self.budget_savings, "budget_savings")
+        self.tax_rate_bp = parse_basis_points(self.tax_bracket, "tax_bracket")
+
+    @classmethod
+    def from_json(cls, loaded_json: dict) -> "PlanConfig":
+        return cls(
+            loaded_json.get("loans"),
+            loaded_json.get("windfalls"),
+            loaded_json.get("user"),
+        )
+
+    def canonical(self) -> dict:
+        """Parsed values only, "4,000" and "4000" or 4/1 and 04/01 are the same"""
+        return {
+            "loans": [
+                {
+                    "lender_name": loan.lender_name,
+                    "loan_type": loan.loan_type,
+                    "balance_cents": loan.balance_cents,
+                    "rate_bp": loan.rate_bp,
+                    "min_payment_cents": loan.min_payment_cents,
+                    "deductible": loan.deductible == "1",
+                    "promo": loan.promo_details
+                    and {
+                        "regular_rate_bp": loan.promo_details.regular_rate_bp,
+                        "promo_rate_bp": loan.promo_details.promo_rate_bp,
+                        "end_date": _iso_date(loan.promo_details.end_date),
+                        "minimum_monthly_payment_cents": (
+                            loan.promo_details.minimum_monthly_payment_cents
+                        ),
+                        "promo_type": loan.promo_details.promo_type,
+                    },
+                }
+                for loan in self.loans
+            ],
+            "windfalls": [
+                [_iso_date(windfall.date), windfall.amount_cents]
+                for windfall in self.windfalls
+            ],
+            "tax_rate_bp": self.tax_rate_bp,
+            "budget_savings_cents": self.budget_savings_cents,
+            "raises": str(_decimal(self.raises, "raises").normalize()),
+        }
+
+
+def _iso_date(value: str) -> str:
+    return datetime.strptime(value, DATE_FORMAT).date().isoformat()
+
+
+def config_hash(loaded_json: dict) -> str:
+    """sha256 of the canonical form of a plan config"""
+    canonical = PlanConfig.from_json(loaded_json).canonical()
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha256(encoded).hexdigest()
@@ -0,0 +1,249 @@
+"""
+    Monte Carlo view of a plan whose windfalls and raises are uncertain.
+    Each trial draws whether every windfall happens, its amount and how
+    many months late or early it lands, and the size and start of any
+    raises, then all trials of a chunk run together on the vectorized
+    batch engine. Trials are split into fixed size chunks, each seeded
+    from one SeedSequence so results don't depend on the worker count,
+    and chunks run in a process pool for large runs.
+"""
+import argparse
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from amortization import MAX_MONTHS, month_date, parse_amount
+from batch_amortization import PortfolioBatch, simulate_batch
+
+
+LOG = logging.getLogger(__name__)
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+class Uncertainty(NamedTuple):
+    """
+        How far the config's windfalls and raises can be off. Windfall
+        amounts vary by windfall_sd (a fraction of the amount) and land up
+        to windfall_delay months either side, raises start in a month
+        between raise_months (plan months) and add about raise_amount a
+        month. raises is the number of raises, the config's by default.
+    """
+
+    windfall_probability: float = 1.0
+    windfall_sd: float = 0.0
+    windfall_delay: int = 0
+    raises: Optional[int] = None
+    raise_probability: float = 1.0
+    raise_amount: float = 0.0
+    raise_sd: float = 0.0
+    raise_months: Tuple[int, int] = (1, 12)
+
+
+class MonteCarloResult:
+    """Debt-free month and interest of every trial, -1 when not paid off"""
+
+    def __init__(
+        self,
+        start: date,
+        debt_free_months: np.ndarray,
+        total_interest: np.ndarray,
+        after_tax_interest: np.ndarray,
+    ):
+        self.start = start
+        self.debt_free_months = debt_free_months
+        self.total_interest = total_interest
+        self.after_tax_interest = after_tax_interest
+
+    def __len__(self):
+        return len(self.debt_free_months)
+
+    @property
+    def paid_off_share(self) -> float:
+        return float((self.debt_free_months >= 0).mean()) if len(self) else 0.0
+
+    def percentiles(self, q: Sequence[int] = PERCENTILES) -> Dict[int, dict]:
+        """
+            Debt-free date and interest at each percentile, trials not
+            paid off count as the latest and give a date of None
+        """
+        if not len(self):
+            return {}
+        months = np.sort(
+            np.where(self.debt_free_months < 0, np.inf, self.debt_free_months)
+        )
+        # nearest trial at or above each percentile, so it is a real month
+        ranks = np.ceil(np.asarray(q) / 100 * (len(months) - 1)).astype(int)
+        month_values = months[ranks]
+        interest = np.percentile(self.total_interest, q)
+        after_tax = np.percentile(self.after_tax_interest, q)
+        return {
+            percentile: {
+                "debt_free_date": (
+                    month_date(self.start, int(month)).isoformat()
+                    if np.isfinite(month)
+                    else None
+                ),
+                "total_interest": round(float(total), 2),
+                "after_tax_interest": round(float(taxed), 2),
+            }
+            for percentile, month, total, taxed in zip(
+                q, month_values, interest, after_tax
+            )
+        }
+
+
+def draw(
+    base: PortfolioBatch,
+    uncertainty: Uncertainty,
+    raises: int,
+    trials: int,
+    rng: np.random.Generator,
+) -> PortfolioBatch:
+    """trials copies of a single portfolio batch with sampled windfalls and raises"""
+    batch = base.repeat(trials)
+    shape = batch.windfall_amounts.shape
+    if shape[1]:
+        happens = rng.random(shape) < uncertainty.windfall_probability
+        scale = np.maximum(1 + uncertainty.windfall_sd * rng.standard_normal(shape), 0)
+        batch.windfall_amounts = batch.windfall_amounts * scale * happens
+        delay = uncertainty.windfall_delay
+        shift = rng.integers(-delay, delay + 1, shape)
+        batch.windfall_months = np.maximum(batch.windfall_months + shift, 1)
+    if raises:
+        shape = (trials, raises)
+        first, last = uncertainty.raise_months
+        happens = rng.random(shape) < uncertainty.raise_probability
+        amounts = rng.normal(uncertainty.raise_amount, uncertainty.raise_sd, shape)
+        batch.raise_amounts = np.maximum(amounts, 0) * happens
+        batch.raise_months = rng.integers(first, last + 1, shape)
+    return batch
+
+
+def _run_chunk(
+    base: PortfolioBatch,
+    uncertainty: Uncertainty,
+    raises: int,
+    trials: int,
+    seed: np.random.SeedSequence,
+    max_months: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    batch = draw(base, uncertainty, raises, trials, np.random.default_rng(seed))
+    result = simulate_batch(batch, max_months=max_months)
+    discount = 1 - batch.tax_rates[:, None] * batch.deductible
+    return (
+        result.debt_free_months,
+        result.total_interest,
+        (result.interest * discount).sum(axis=1),
+    )
+
+
+def run(
+    loaded_json: dict,
+    uncertainty: Uncertainty = Uncertainty(),
+    trials: int = 10000,
+    seed: int = 0,
+    workers: int = None,
+    chunk_size: int = 5000,
+    start: date = None,
+    max_months: int = MAX_MONTHS,
+) -> MonteCarloResult:
+    """
+        Run trials of one plan config, workers=1 keeps every chunk in this
+        process. The same seed and chunk_size give the same trials.
+    """
+    start = (start or date.today()).replace(day=1)
+    base = PortfolioBatch.from_configs([loaded_json], start)
+    raises = uncertainty.raises
+    if raises is None:
+        raises = int(parse_amount((loaded_json.get("user") or {}).get("raises")))
+    sizes = [min(chunk_size, trials - done) for done in range(0, trials, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    chunks = [
+        (base, uncertainty, raises, size, chunk_seed, max_months)
+        for size, chunk_seed in zip(sizes, seeds)
+    ]
+    if workers == 1 or len(chunks) < 2:
+        results = [_run_chunk(*chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_run_chunk, *zip(*chunks)))
+    if not results:
+        empty = np.zeros(0)
+        return MonteCarloResult(start, empty.astype(np.int64), empty, empty)
+    months, interest, after_tax = (np.concatenate(parts) for parts in zip(*results))
+    return MonteCarloResult(start, months, interest, after_tax)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("config", help="plan config json")
+    parser.add_argument("--trials", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument(
+        "--start", type=date.fromisoformat, default=None, help="yyyy-mm-dd"
+    )
+    parser.add_argument("--windfall-probability", type=float, default=1.0)
+    parser.add_argument(
+        "--windfall-sd", type=float, default=0.0, help="as a fraction of the amount"
+    )
+    parser.add_argument(
+        "--windfall-delay", type=int, default=0, help="months early or late"
+    )
+    parser.add_argument("--raises", type=int, default=None)
+    parser.add_argument("--raise-probability", type=float, default=1.0)
+    parser.add_argument("--raise-amount", type=float, default=0.0)
+    parser.add_argument("--raise-sd", type=float, default=0.0)
+    parser.add_argument(
+        "--raise-months",
+        type=int,
+        nargs=2,
+        default=(1, 12),
+        metavar=("FIRST", "LAST"),
+        help="plan months a raise can start in",
+    )
+    parser.add_argument("--output", default=None, help="write percentiles as json")
+    args = parser.parse_args()
+
+    with open(args.config, "r") as loan_json:
+        loaded_json = json.load(loan_json)
+    monte_carlo = run(
+        loaded_json,
+        Uncertainty(
+            windfall_probability=args.windfall_probability,
+            windfall_sd=args.windfall_sd,
+            windfall_delay=args.windfall_delay,
+            raises=args.raises,
+            raise_probability=args.raise_probability,
+            raise_amount=args.raise_amount,
+            raise_sd=args.raise_sd,
+            raise_months=tuple(args.raise_months),
+        ),
+        trials=args.trials,
+        seed=args.seed,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        start=args.start,
+    )
+    summary = monte_carlo.percentiles()
+    LOG.info(f"{monte_carlo.paid_off_share:.1%} of {len(monte_carlo)} trials paid off")
+    for percentile, values in summary.items():
+        LOG.info(
+            f"p{percentile}: debt-free {values['debt_free_date']}, "
+            f"{values['total_interest']:,.2f} interest "
+            f"({values['after_tax_interest']:,.2f} after tax)"
+        )
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(
+                {"paid_off_share": monte_carlo.paid_off_share, "percentiles": summary},
+                output_file,
+                indent=2,
+            )
@@ -0,0 +1,392 @@
+"""
+    Turn saved plans into structured records. The results fragments the
+    http and selenium backends save to plans/*.html are read in a single
+    html.parser pass that collects every table with the heading above it,
+    tables are then recognised by their column headers as a per debt
+    summary or a payment schedule (one row per month and debt, or one
+    column per debt). Plans from the local backend (plans/*.json) map to the
+    same records. The bulk mode parses whole directories in a process pool
+    into one columnar table.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from html.parser import HTMLParser
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+
+LOG = logging.getLogger(__name__)
+
+HEADINGS = ("h1", "h2", "h3", "h4", "h5", "h6", "caption")
+DATE_FORMATS = (
+    "%m/%d/%Y",
+    "%Y-%m-%d",
+    "%b %d, %Y",
+    "%B %d, %Y",
+    "%m/%Y",
+    "%b %Y",
+    "%B %Y",
+)
+# checked in order, specific names before the ones they contain
+COLUMNS = {
+    "payoff_date": (
+        "payoff date",
+        "pay off date",
+        "paid off",
+        "debt free",
+        "debt-free",
+    ),
+    "months": ("months", "time to"),
+    "interest": ("interest",),
+    "payment": ("payment", "paid"),
+    "balance": ("balance", "remaining"),
+    "lender_name": ("debt", "lender", "creditor", "loan", "card", "name"),
+    "month": ("month", "period", "#"),
+    "date": ("date",),
+}
+IGNORED_COLUMNS = ("rate",)
+MONTHS_TEXT = re.compile(r"(?:(\d+)\s*y[a-z]*)?[\s,]*(?:(\d+)\s*m[a-z]*)?", re.I)
+
+
+class DebtPayoff(NamedTuple):
+    plan_name: str
+    lender_name: str
+    payoff_date: Optional[date]
+    months: Optional[int]
+    total_interest: Optional[float]
+
+
+class ScheduleEntry(NamedTuple):
+    plan_name: str
+    lender_name: str
+    month: Optional[int]
+    date: Optional[date]
+    payment: Optional[float]
+    interest: Optional[float]
+    balance: Optional[float]
+
+
+class ParsedPlan(NamedTuple):
+    plan_name: str
+    debts: List[DebtPayoff]
+    schedule: List[ScheduleEntry]
+
+    @property
+    def total_interest(self) -> Optional[float]:
+        interest = [
+            d.total_interest for d in self.debts if d.total_interest is not None
+        ]
+        return sum(interest) if interest else None
+
+    @property
+    def debt_free_date(self) -> Optional[date]:
+        """Last payoff date, None unless every debt is paid off"""
+        payoff_dates = [d.payoff_date for d in self.debts]
+        if not payoff_dates or None in payoff_dates:
+            return None
+        return max(payoff_dates)
+
+    @property
+    def months(self) -> Optional[int]:
+        """Months until debt-free, None unless every debt is paid off"""
+        months = [d.months for d in self.debts]
+        if not months or None in months:
+            return None
+        return max(months)
+
+
+class Table(NamedTuple):
+    heading: str
+    headers: List[str]
+    rows: List[List[str]]
+
+
+class TableCollector(HTMLParser):
+    """Single pass over a fragment keeping the text of every table cell"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tables: List[Table] = []
+        self.heading = ""
+        self.text = None
+        self.row = None
+        self.row_is_header = False
+        self.in_heading = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in HEADINGS:
+            self.in_heading, self.text = True, []
+        elif tag == "table":
+            self.tables.append(Table(self.heading, [], []))
+        elif tag == "tr" and self.tables:
+            self.row, self.row_is_header = [], False
+        elif tag in ("td", "th") and self.row is not None:
+            self.text = []
+            self.row_is_header |= tag == "th"
+
+    def handle_endtag(self, tag):
+        if tag in HEADINGS and self.in_heading:
+            self.heading, self.in_heading, self.text = self._text(), False, None
+        elif tag in ("td", "th") and self.row is not None and self.text is not None:
+            self.row.append(self._text())
+            self.text = None
+        elif tag == "tr" and self.row is not None:
+            table = self.tables[-1]
+            if self.row_is_header and not table.rows and not table.headers:
+                table.headers.extend(self.row)
+            elif any(self.row):
+                table.rows.append(self.row)
+            self.row = None
+
+    def handle_data(self, data):
+        if self.text is not None:
+            self.text.append(data)
+
+    def _text(self) -> str:
+        return " ".join("".join(self.text).split())
+
+
+def parse_number(text: str) -> Optional[float]:
+    """ "$1,234.56" -> 1234.56, "(12.00)" -> -12.0, blanks and dashes -> None"""
+    cleaned = text.replace("$", "").replace(",", "").replace("%", "").strip()
+    negative = cleaned.startswith("(") and cleaned.endswith(")")
+    try:
+        value = float(cleaned.strip("()"))
+    except ValueError:
+        return None
+    return -value if negative else value
+
+
+def parse_date(text: str) -> Optional[date]:
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text.strip(), date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_months(text: str) -> Optional[int]:
+    """ "27", "2 years 3 months" and "2 yrs, 3 mos" are all month counts"""
+    number = parse_number(text)
+    if number is not None:
+        return int(number)
+    match = MONTHS_TEXT.fullmatch(text.strip())
+    if match and any(match.groups()):
+        years, months = (int(group or 0) for group in match.groups())
+        return years * 12 + months
+    return None
+
+
+def column_roles(headers: List[str]) -> Dict[str, int]:
+    """Header index for each known column, the first matching header wins"""
+    roles = {}
+    for index, header in enumerate(headers):
+        lowered = header.lower()
+        if any(name in lowered for name in IGNORED_COLUMNS):
+            continue
+        for role, names in COLUMNS.items():
+            if any(name in lowered for name in names):
+                roles.setdefault(role, index)
+                break
+    return roles
+
+
+def _cell(row: List[str], roles: Dict[str, int], role: str) -> Optional[str]:
+    index = roles.get(role)
+    if index is not None and index < len(row):
+        return row[index]
+    return None
+
+
+def _summary(plan_name: str, table: Table, roles: Dict[str, int]) -> List[DebtPayoff]:
+    debts = []
+    for row in table.rows:
+        lender = _cell(row, roles, "lender_name")
+        if not lender or lender.lower().startswith("total"):
+            continue
+        payoff = _cell(row, roles, "payoff_date")
+        months = _cell(row, roles, "months")
+        interest = _cell(row, roles, "interest")
+        debts.append(
+            DebtPayoff(
+                plan_name,
+                lender,
+                parse_date(payoff) if payoff else None,
+                parse_months(months) if months else None,
+                parse_number(interest) if interest else None,
+            )
+        )
+    return debts
+
+
+def _schedule(plan_name: str, table: Table, roles: Dict[str, int]):
+    entries = []
+    # without payment or balance columns every other column is a debt
+    wide = "payment" not in roles and "balance" not in roles
+    debt_columns = [
+        (index, header)
+        for index, header in enumerate(table.headers)
+        if index not in (roles.get("month"), roles.get("date"))
+        and header
+        and not header.lower().startswith("total")
+    ]
+    for row in table.rows:
+        month_text, date_text = _cell(row, roles, "month"), _cell(row, roles, "date")
+        month = parse_months(month_text) if month_text else None
+        when = parse_date(date_text or month_text or "")
+        if month is None and when is None:
+            continue
+        if wide:
+            for index, lender in debt_columns:
+                if index < len(row):
+                    payment = parse_number(row[index])
+                    entries.append(
+                        ScheduleEntry(
+                            plan_name, lender, month, when, payment, None, None
+                        )
+                    )
+            continue
+        lender = _cell(row, roles, "lender_name") or table.heading
+        values = {
+            role: parse_number(_cell(row, roles, role) or "")
+            for role in ("payment", "interest", "balance")
+        }
+        entries.append(ScheduleEntry(plan_name, lender, month, when, **values))
+    return entries
+
+
+def parse_fragment(html: str, plan_name: str) -> ParsedPlan:
+    collector = TableCollector()
+    collector.feed(html)
+    collector.close()
+    debts, schedule = [], []
+    for table in collector.tables:
+        roles = column_roles(table.headers)
+        if "month" in roles or ("date" in roles and "payoff_date" not in roles):
+            schedule.extend(_schedule(plan_name, table, roles))
+        elif "lender_name" in roles:
+            debts.extend(_summary(plan_name, table, roles))
+    return ParsedPlan(plan_name, debts, schedule)
+
+
+def parse_local_plan(plan: dict, plan_name: str) -> ParsedPlan:
+    """Records from a PayDownPlan.to_dict written by the local backend"""
+    debts = [
+        DebtPayoff(
+            plan_name,
+            debt["lender_name"],
+            date.fromisoformat(debt["payoff_date"]) if debt["payoff_date"] else None,
+            debt["months"],
+            debt["total_interest"],
+        )
+        for debt in plan["debts"]
+    ]
+    schedule = [
+        ScheduleEntry(
+            plan_name,
+            debt.lender_name,
+            row["month"],
+            date.fromisoformat(row["date"]),
+            row["payments"][index],
+            row["interest"][index],
+            row["balances"][index],
+        )
+        for row in plan["schedule"]
+        for index, debt in enumerate(debts)
+    ]
+    return ParsedPlan(plan_name, debts, schedule)
+
+
+def parse_plan(path: str) -> ParsedPlan:
+    """Parse one saved plan, html from the web backends or local json"""
+    plan_name, extension = os.path.splitext(os.path.basename(path))
+    with open(path, "r") as plan_file:
+        if extension == ".json":
+            return parse_local_plan(json.load(plan_file), plan_name)
+        return parse_fragment(plan_file.read(), plan_name)
+
+
+def plan_paths(directory: str = "plans") -> List[str]:
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.endswith((".html", ".json"))
+    )
+
+
+def to_columns(records: Iterable[NamedTuple], fields: Iterable[str]) -> Dict:
+    """
+        Columnar view of records: floats with nan and dates as datetime64
+        with NaT for missing values, months -1 when unknown
+    """
+    records = list(records)
+    columns = {}
+    for field in fields:
+        values = [getattr(record, field) for record in records]
+        if field in ("date", "payoff_date"):
+            columns[field] = np.array(
+                [value or "NaT" for value in values], dtype="datetime64[D]"
+            )
+        elif field in ("month", "months"):
+            columns[field] = np.array(
+                [-1 if value is None else value for value in values], dtype=np.int64
+            )
+        elif field in ("plan_name", "lender_name"):
+            columns[field] = np.array(values, dtype=object)
+        else:
+            columns[field] = np.array(
+                [np.nan if value is None else value for value in values], dtype=float
+            )
+    return columns
+
+
+def parse_plans(paths: Iterable[str], workers: int = None, chunksize: int = 64):
+    """
+        Parse many plans in a process pool into two columnar tables,
+        (debts, schedule), each a dict of numpy arrays
+    """
+    debts, schedule = [], []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for plan in executor.map(parse_plan, paths, chunksize=chunksize):
+            debts.extend(plan.debts)
+            schedule.extend(plan.schedule)
+    return (
+        to_columns(debts, DebtPayoff._fields),
+        to_columns(schedule, ScheduleEntry._fields),
+    )
+
+
+def write_csv(columns: Dict, path: str):
+    with open(path, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(columns)
+        writer.writerows(zip(*columns.values()))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("plans_dir", nargs="?", default="plans")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output-dir", default="plan_tables")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    debt_table, schedule_table = parse_plans(
+        plan_paths(args.plans_dir), workers=args.workers
+    )
+    write_csv(debt_table, os.path.join(args.output_dir, "debts.csv"))
+    write_csv(schedule_table, os.path.join(args.output_dir, "schedule.csv"))
+    LOG.info(
+        f"{len(debt_table['plan_name'])} debts and "
+        f"{len(schedule_table['plan_name'])} schedule rows written to "
+        f"{args.output_dir}"
+    )
@@ -0,0 +1,330 @@
+"""
+    SQLite store for generated plans. Every plan is saved with the hash and
+    inputs of its config, the per debt outcomes and the schedule rows, with
+    indexes on config hash, plan name, debt free date and total interest so
+    questions like "which budget_savings gets us debt free before 2026" are
+    one query. The raw results html can be kept zlib compressed, stored
+    once per content hash.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import List, Optional
+
+from amortization import parse_amount
+from models import config_hash
+from plan_parser import ParsedPlan, parse_fragment, parse_plan, plan_paths
+
+
+LOG = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    id INTEGER PRIMARY KEY,
+    plan_name TEXT NOT NULL,
+    config_hash TEXT,
+    backend TEXT,
+    created REAL NOT NULL,
+    inputs TEXT,
+    budget_savings REAL,
+    debt_free_date TEXT,
+    months INTEGER,
+    total_interest REAL,
+    html_hash TEXT REFERENCES pages (hash)
+);
+CREATE TABLE IF NOT EXISTS debts (
+    plan_id INTEGER NOT NULL REFERENCES plans (id),
+    lender_name TEXT,
+    payoff_date TEXT,
+    months INTEGER,
+    total_interest REAL
+);
+CREATE TABLE IF NOT EXISTS schedule (
+    plan_id INTEGER NOT NULL REFERENCES plans (id),
+    lender_name TEXT,
+    month INTEGER,
+    date TEXT,
+    payment REAL,
+    interest REAL,
+    balance REAL
+);
+CREATE TABLE IF NOT EXISTS pages (hash TEXT PRIMARY KEY, html BLOB NOT NULL);
+CREATE INDEX IF NOT EXISTS plans_config_hash ON plans (config_hash);
+CREATE INDEX IF NOT EXISTS plans_plan_name ON plans (plan_name);
+CREATE INDEX IF NOT EXISTS plans_debt_free_date ON plans (debt_free_date);
+CREATE INDEX IF NOT EXISTS plans_total_interest ON plans (total_interest);
+CREATE INDEX IF NOT EXISTS debts_plan_id ON debts (plan_id);
+CREATE INDEX IF NOT EXISTS debts_payoff_date ON debts (payoff_date);
+CREATE INDEX IF NOT EXISTS schedule_plan_id ON schedule (plan_id);
+"""
+PLAN_COLUMNS = (
+    "id",
+    "plan_name",
+    "config_hash",
+    "backend",
+    "budget_savings",
+    "debt_free_date",
+    "months",
+    "total_interest",
+)
+
+
+def _isoformat(value) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+class PlanStore:
+    """
+        Plans in one SQLite file, safe to share between the threads of a
+        batch. Inserts are committed one plan at a time unless they happen
+        inside transaction(), which commits the whole run at once.
+    """
+
+    def __init__(self, path: str = "plans.db", keep_html: bool = False):
+        self.path = path
+        self.keep_html = keep_html
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False
+        )
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+        self.in_transaction = False
+
+    @contextmanager
+    def transaction(self):
+        """
+            Commit everything added in the block at once, other threads keep
+            adding while it is open. Nested blocks are savepoints.
+        """
+        with self.lock:
+            nested = self.in_transaction
+            self.connection.execute("SAVEPOINT plan_store" if nested else "BEGIN")
+            self.in_transaction = True
+        try:
+            yield
+        except Exception:
+            with self.lock:
+                if nested:
+                    self.connection.execute("ROLLBACK TO plan_store")
+                    self.connection.execute("RELEASE plan_store")
+                else:
+                    self.connection.execute("ROLLBACK")
+                    self.in_transaction = False
+            raise
+        with self.lock:
+            self.connection.execute("RELEASE plan_store" if nested else "COMMIT")
+            if not nested:
+                self.in_transaction = False
+
+    def add(
+        self,
+        plan: ParsedPlan,
+        loaded_json: dict = None,
+        backend: str = None,
+        html: str = None,
+    ) -> int:
+        """Insert a parsed plan, returns its id"""
+        budget = (loaded_json or {}).get("user", {}).get("budget_savings")
+        with self.lock, self.transaction():
+            html_hash = self._add_page(html) if html and self.keep_html else None
+            plan_id = self.connection.execute(
+                "INSERT INTO plans (plan_name, config_hash, backend, created, inputs,"
+                " budget_savings, debt_free_date, months, total_interest, html_hash)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    plan.plan_name,
+                    config_hash(loaded_json) if loaded_json else None,
+                    backend,
+                    time.time(),
+                    json.dumps(loaded_json, sort_keys=True) if loaded_json else None,
+                    parse_amount(budget) if budget is not None else None,
+                    _isoformat(plan.debt_free_date),
+                    plan.months,
+                    plan.total_interest,
+                    html_hash,
+                ),
+            ).lastrowid
+            self.connection.executemany(
+                "INSERT INTO debts VALUES (?, ?, ?, ?, ?)",
+                (
+                    (
+                        plan_id,
+                        debt.lender_name,
+                        _isoformat(debt.payoff_date),
+                        debt.months,
+                        debt.total_interest,
+                    )
+                    for debt in plan.debts
+                ),
+            )
+            self.connection.executemany(
+                "INSERT INTO schedule VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        plan_id,
+                        entry.lender_name,
+                        entry.month,
+                        _isoformat(entry.date),
+                        entry.payment,
+                        entry.interest,
+                        entry.balance,
+                    )
+                    for entry in plan.schedule
+                ),
+            )
+        return plan_id
+
+    def _add_page(self, html: str) -> str:
+        content_hash = hashlib.sha256(html.encode()).hexdigest()
+        self.connection.execute(
+            "INSERT OR IGNORE INTO pages VALUES (?, ?)",
+            (content_hash, zlib.compress(html.encode(), 9)),
+        )
+        return content_hash
+
+    def add_file(self, path: str, loaded_json: dict = None, backend: str = None) -> int:
+        """Store a saved plans/ file, html or local json"""
+        if path.endswith(".json"):
+            return self.add(parse_plan(path), loaded_json, backend)
+        plan_name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "r") as page:
+            html = page.read()
+        return self.add(parse_fragment(html, plan_name), loaded_json, backend, html)
+
+    def html(self, plan_id: int) -> Optional[str]:
+        row = self.connection.execute(
+            "SELECT pages.html FROM plans JOIN pages ON pages.hash = plans.html_hash"
+            " WHERE plans.id = ?",
+            (plan_id,),
+        ).fetchone()
+        return zlib.decompress(row["html"]).decode() if row else None
+
+    def query(
+        self,
+        debt_free_before: str = None,
+        max_interest: float = None,
+        config_hash: str = None,
+        plan_name: str = None,
+        order_by: str = "total_interest",
+        limit: int = 50,
+    ) -> List[sqlite3.Row]:
+        """Plans matching every given filter, dates as YYYY-MM-DD"""
+        if order_by not in PLAN_COLUMNS:
+            raise ValueError(f"Can't order plans by {order_by}")
+        filters, values = [], []
+        if debt_free_before:
+            filters.append("debt_free_date < ?")
+            values.append(debt_free_before)
+        if max_interest is not None:
+            filters.append("total_interest <= ?")
+            values.append(max_interest)
+        if config_hash:
+            filters.append("config_hash = ?")
+            values.append(config_hash)
+        if plan_name:
+            filters.append("plan_name = ?")
+            values.append(plan_name)
+        where = f" WHERE {' AND '.join(filters)}" if filters else ""
+        return self.connection.execute(
+            f"SELECT {', '.join(PLAN_COLUMNS)} FROM plans{where}"
+            f" ORDER BY {order_by} LIMIT ?",
+            (*values, limit),
+        ).fetchall()
+
+    def compare(self, plan_ids: List[int]) -> dict:
+        """Lender name to {plan id: (payoff date, months, interest)}"""
+        rows = self.connection.execute(
+            "SELECT * FROM debts WHERE plan_id IN"
+            f" ({', '.join('?' * len(plan_ids))}) ORDER BY lender_name",
+            plan_ids,
+        ).fetchall()
+        comparison = {}
+        for row in rows:
+            comparison.setdefault(row["lender_name"], {})[row["plan_id"]] = (
+                row["payoff_date"],
+                row["months"],
+                row["total_interest"],
+            )
+        return comparison
+
+    def close(self):
+        self.connection.close()
+
+
+def _print_rows(rows: List[sqlite3.Row]):
+    print("  ".join(f"{column:>16}" for column in PLAN_COLUMNS))
+    for row in rows:
+        values = [
+            f"{value:.2f}" if isinstance(value, float) else str(value)
+            for value in (row[column] for column in PLAN_COLUMNS)
+        ]
+        print("  ".join(f"{value:>16.16}" for value in values))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default="plans.db")
+    commands = parser.add_subparsers(dest="command")
+    import_command = commands.add_parser("import", help="store saved plans/ files")
+    import_command.add_argument("plans_dir", nargs="?", default="plans")
+    import_command.add_argument("--config-dir", default="plan_configs")
+    import_command.add_argument("--html", action="store_true", help="keep the html")
+    query_command = commands.add_parser("query")
+    query_command.add_argument("--debt-free-before", default=None)
+    query_command.add_argument("--max-interest", type=float, default=None)
+    query_command.add_argument("--config-hash", default=None)
+    query_command.add_argument("--plan-name", default=None)
+    query_command.add_argument("--order-by", default="total_interest")
+    query_command.add_argument("--limit", type=int, default=50)
+    compare_command = commands.add_parser("compare")
+    compare_command.add_argument("plan_ids", type=int, nargs="+")
+    html_command = commands.add_parser("html")
+    html_command.add_argument("plan_id", type=int)
+    args = parser.parse_args()
+
+    store = PlanStore(args.db, keep_html=getattr(args, "html", False))
+    if args.command == "import":
+        configs = {}
+        if os.path.isdir(args.config_dir):
+            for name in os.listdir(args.config_dir):
+                if name.endswith(".json"):
+                    with open(os.path.join(args.config_dir, name)) as config_file:
+                        configs[name[: -len(".json")]] = json.load(config_file)
+        paths = plan_paths(args.plans_dir)
+        with store.transaction():
+            for plan_path in paths:
+                stem = os.path.splitext(os.path.basename(plan_path))[0]
+                # selenium plans are saved as {plan}-{budget_savings}-savings
+                config = configs.get(stem) or configs.get(stem.rsplit("-", 2)[0])
+                store.add_file(plan_path, config)
+        LOG.info(f"Stored {len(paths)} plans in {args.db}")
+    elif args.command == "query":
+        _print_rows(
+            store.query(
+                args.debt_free_before,
+                args.max_interest,
+                args.config_hash,
+                args.plan_name,
+                args.order_by,
+                args.limit,
+            )
+        )
+    elif args.command == "compare":
+        for lender, outcomes in store.compare(args.plan_ids).items():
+            print(lender)
+            for plan_id, (payoff_date, months, interest) in outcomes.items():
+                print(f"  plan {plan_id}: {payoff_date}, {months} months, {interest}")
+    elif args.command == "html":
+        print(store.html(args.plan_id) or "")
+    else:
+        parser.print_help()
+    store.close()
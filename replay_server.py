@@ -0,0 +1,192 @@
+"""
+    Offline stand-in for the bankrate calculator. SessionRecorder captures
+    every exchange a DebtCalculatorClient makes to a fixture file and
+    ReplayServer serves those exchanges back from a local HTTP server so
+    the client can be benchmarked and load tested without hitting
+    bankrate.com. Exchanges are keyed by the posted fields chained with
+    the key of the exchange that served the posted view state: the server
+    swaps every recorded __VIEWSTATE for its exchange's key, so the
+    client posts that key back and the same fields posted at a different
+    point of a conversation, or in another recorded plan, replay their
+    own responses.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional
+from urllib.parse import parse_qsl
+
+import requests
+
+from view_state import EVENT_VALIDATION, VIEW_STATE
+
+
+LOG = logging.getLogger(__name__)
+
+STEP_FIELD = "ctl00$well$defaultUC$isValid"
+CALCULATOR_PATH = "/calculators/managing-debt/debt-pay-down-calculator.aspx"
+
+
+def exchange_key(method: str, fields: Optional[dict], previous_key: str = None) -> str:
+    """
+        Posted fields minus the hidden state, chained with the key of the
+        exchange whose view state was posted
+    """
+    fields = {
+        name: str(value)
+        for name, value in (fields or {}).items()
+        if value is not None and name not in (VIEW_STATE, EVENT_VALIDATION)
+    }
+    digest = hashlib.sha256((previous_key or "").encode())
+    digest.update(json.dumps([method, fields], sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class SessionRecorder:
+    """Collects the exchanges of a client conversation"""
+
+    def __init__(self):
+        self.exchanges = []
+        # recorded view state to the key of the exchange that served it
+        self.keys: Dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    def record(
+        self,
+        method: str,
+        params: Optional[dict],
+        response: requests.Response,
+        view_state: Optional[str],
+    ):
+        """view_state is the one the response carried, None without one"""
+        params = params or {}
+        with self.lock:
+            key = exchange_key(method, params, self.keys.get(params.get(VIEW_STATE)))
+            if view_state:
+                self.keys[view_state] = key
+            self.exchanges.append(
+                {
+                    "method": method,
+                    "step": params.get(STEP_FIELD),
+                    "key": key,
+                    "status": response.status_code,
+                    "view_state": view_state,
+                    "body": response.text,
+                }
+            )
+
+    def save(self, path: str):
+        with open(path, "w") as fixture:
+            json.dump({"exchanges": self.exchanges}, fixture)
+
+
+class ReplayServer:
+    """
+        Local HTTP server replaying recorded exchanges. latency seconds are
+        slept before every response and padding bytes of html comment are
+        added to every body to simulate heavier pages. Exchanges that were
+        never recorded get default_page, or a 404 without one.
+    """
+
+    def __init__(
+        self,
+        fixture_paths: Iterable[str] = (),
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        padding: int = 0,
+        default_page: bytes = None,
+    ):
+        self.responses: Dict[str, tuple] = {}
+        for path in fixture_paths:
+            with open(path, "r") as fixture:
+                for exchange in json.load(fixture)["exchanges"]:
+                    body = exchange["body"]
+                    if exchange["view_state"]:
+                        body = body.replace(exchange["view_state"], exchange["key"])
+                    self.responses[exchange["key"]] = (
+                        exchange["status"],
+                        body.encode(),
+                    )
+        self.latency = latency
+        self.default_page = default_page
+        self.padding = b"<!--" + b" " * max(padding - 7, 0) + b"-->" if padding else b""
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{CALCULATOR_PATH}"
+
+    def _handler(self):
+        server = self
+
+        class ReplayHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.replay(exchange_key("GET", None))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                fields = dict(parse_qsl(self.rfile.read(length).decode(), True))
+                self.replay(exchange_key("POST", fields, fields.get(VIEW_STATE)))
+
+            def replay(self, key: str):
+                if server.latency:
+                    time.sleep(server.latency)
+                missing = (
+                    (200, server.default_page)
+                    if server.default_page
+                    else (404, b"No recorded exchange")
+                )
+                status, body = server.responses.get(key, missing)
+                body = body.replace(b"</body>", server.padding + b"</body>", 1)
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, message_format, *args):
+                LOG.debug(message_format % args)
+
+        return ReplayHandler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        LOG.info(f"Replaying {len(self.responses)} exchanges at {self.url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("fixtures", nargs="+")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--padding", type=int, default=0)
+    args = parser.parse_args()
+
+    replay = ReplayServer(
+        args.fixtures, args.host, args.port, args.latency, args.padding
+    ).start()
+    try:
+        replay.thread.join()
+    except KeyboardInterrupt:
+        replay.stop()
@@ -0,0 +1,235 @@
+"""
+    Scheduler owning every outbound calculator request. Each host has a
+    token bucket, at most max_conversations client conversations run at
+    once and waiters are served by priority class (interactive before
+    batch sweeps, first come first served within a class). A 429 or 5xx
+    halves the host's rate and pauses it, for Retry-After when given or
+    else for a backoff that doubles with every throttle in a row, so even
+    a host without a rate limit waits. Successes add the rate back step
+    by step and reset the backoff. Queue depth and wait times
+    are kept per priority so the limits can be tuned.
+"""
+import heapq
+import itertools
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+
+INTERACTIVE = 0
+BATCH = 1
+PRIORITIES = {"interactive": INTERACTIVE, "batch": BATCH}
+THROTTLE_STATUSES = (429, 500, 502, 503, 504)
+
+
+class WaitStats:
+    """Count, total and longest wait of one priority class"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.longest = 0.0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.longest = max(self.longest, seconds)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_wait_seconds": self.total / self.count if self.count else 0.0,
+            "max_wait_seconds": self.longest,
+        }
+
+
+class HostBucket:
+    """Token bucket of one host with its adaptive rate"""
+
+    def __init__(self, rate: float, burst: int):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.backoff = 0.0
+        self.waiting: List[tuple] = []
+        self.throttled = 0
+
+    def refill(self, now: float):
+        if now > self.updated:
+            elapsed = now - self.updated
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def ready_in(self, now: float) -> float:
+        """Seconds until a token can be spent"""
+        self.refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class Scheduler:
+    def __init__(
+        self,
+        requests_per_second: float,
+        burst: int = 1,
+        max_conversations: int = None,
+        min_rate: float = None,
+        recovery: float = 0.1,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+    ):
+        """
+            requests_per_second and burst size the bucket of every host
+            (float("inf") only limits conversations and throttled hosts),
+            a throttled host slows down to min_rate at the lowest (a tenth
+            of the rate by default) and each success adds back recovery
+            times the configured rate. Without Retry-After a throttled host
+            pauses backoff seconds, doubling up to max_backoff while it
+            keeps being throttled.
+        """
+        self.rate = requests_per_second
+        self.burst = burst
+        self.max_conversations = max_conversations
+        self.min_rate = min_rate or requests_per_second / 10
+        self.recovery = recovery
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.condition = threading.Condition()
+        self.hosts: Dict[str, HostBucket] = {}
+        self.order = itertools.count()
+        self.active = 0
+        self.conversation_queue: List[tuple] = []
+        self.request_waits: Dict[int, WaitStats] = defaultdict(WaitStats)
+        self.conversation_waits: Dict[int, WaitStats] = defaultdict(WaitStats)
+        self.max_queue_depth = 0
+
+    def _bucket(self, host: str) -> HostBucket:
+        if host not in self.hosts:
+            self.hosts[host] = HostBucket(self.rate, self.burst)
+        return self.hosts[host]
+
+    def queue_depth(self) -> int:
+        return len(self.conversation_queue) + sum(
+            len(bucket.waiting) for bucket in self.hosts.values()
+        )
+
+    def _enqueue(self, queue: List[tuple], priority: int) -> tuple:
+        entry = (priority, next(self.order))
+        heapq.heappush(queue, entry)
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth())
+        return entry
+
+    def acquire(self, url: str, priority: int = BATCH):
+        """Block until the url's host has a token for this priority"""
+        started = time.monotonic()
+        with self.condition:
+            bucket = self._bucket(urlparse(url).netloc)
+            entry = self._enqueue(bucket.waiting, priority)
+            while True:
+                now = time.monotonic()
+                wait = bucket.ready_in(now)
+                if bucket.waiting[0] == entry and not wait:
+                    heapq.heappop(bucket.waiting)
+                    bucket.tokens -= 1
+                    self.request_waits[priority].add(now - started)
+                    self.condition.notify_all()
+                    return
+                # only the head of the queue can be woken by time passing
+                self.condition.wait(wait if bucket.waiting[0] == entry else None)
+
+    def report(self, url: str, status: Optional[int], retry_after: float = None):
+        """
+            Outcome of a request, status None for a connection error or
+            timeout. Throttling halves the host's rate, anything else
+            recovers it.
+        """
+        with self.condition:
+            bucket = self._bucket(urlparse(url).netloc)
+            if status is None or status in THROTTLE_STATUSES:
+                bucket.throttled += 1
+                bucket.rate = max(self.min_rate, bucket.rate / 2)
+                now = time.monotonic()
+                bucket.refill(now)
+                bucket.tokens = min(bucket.tokens, 0.0)
+                bucket.backoff = min(
+                    self.max_backoff, max(self.backoff, bucket.backoff * 2)
+                )
+                pause = retry_after or max(bucket.backoff, 1 / bucket.rate)
+                bucket.paused_until = max(bucket.paused_until, now + pause)
+            else:
+                bucket.backoff = 0.0
+                bucket.rate = min(
+                    bucket.base_rate, bucket.rate + self.recovery * bucket.base_rate
+                )
+            self.condition.notify_all()
+
+    @contextmanager
+    def conversation(self, priority: int = BATCH):
+        """
+            Hold one of the max_conversations slots for a whole client
+            conversation, yields a limiter for the client's requests
+        """
+        started = time.monotonic()
+        with self.condition:
+            entry = self._enqueue(self.conversation_queue, priority)
+            while self.conversation_queue[0] != entry or (
+                self.max_conversations and self.active >= self.max_conversations
+            ):
+                self.condition.wait()
+            heapq.heappop(self.conversation_queue)
+            self.active += 1
+            self.conversation_waits[priority].add(time.monotonic() - started)
+            self.condition.notify_all()
+        try:
+            yield ConversationLimiter(self, priority)
+        finally:
+            with self.condition:
+                self.active -= 1
+                self.condition.notify_all()
+
+    def stats(self) -> dict:
+        names = {value: name for name, value in PRIORITIES.items()}
+        with self.condition:
+            return {
+                "queue_depth": self.queue_depth(),
+                "max_queue_depth": self.max_queue_depth,
+                "active_conversations": self.active,
+                "requests": {
+                    names.get(p, str(p)): waits.to_dict()
+                    for p, waits in sorted(self.request_waits.items())
+                },
+                "conversations": {
+                    names.get(p, str(p)): waits.to_dict()
+                    for p, waits in sorted(self.conversation_waits.items())
+                },
+                "hosts": {
+                    host: {"rate": bucket.rate, "throttled": bucket.throttled}
+                    for host, bucket in self.hosts.items()
+                },
+            }
+
+    def dump(self, path: str):
+        with open(path, "w") as stats_file:
+            json.dump(self.stats(), stats_file, indent=2)
+
+
+class ConversationLimiter:
+    """The scheduler as seen by one conversation, with its priority bound"""
+
+    def __init__(self, scheduler: Scheduler, priority: int):
+        self.scheduler = scheduler
+        self.priority = priority
+
+    def acquire(self, url: str):
+        self.scheduler.acquire(url, self.priority)
+
+    def report(self, url: str, status: Optional[int], retry_after: float = None):
+        self.scheduler.report(url, status, retry_after)
@@ -0,0 +1,185 @@
+"""
+    Find the smallest monthly budget_savings (or one-time windfall) that
+    gets a plan debt-free by a date and/or under an interest cap. The
+    config is parsed once and plans are run locally with the event
+    driven engine; paying more never pays off later or costs more
+    interest, so the amount is found by doubling until the target is met
+    and bisecting back down. Every evaluated amount is memoized.
+"""
+import argparse
+import json
+import logging
+import time
+from datetime import date
+from typing import Dict, NamedTuple
+
+from amortization import (
+    MAX_MONTHS,
+    PayDownPlan,
+    month_index,
+    portfolio,
+    simulate_portfolio,
+)
+from models import PlanConfig
+
+
+LOG = logging.getLogger(__name__)
+
+FIRST_GUESS_CENTS = 10000
+
+
+class Solution(NamedTuple):
+    amount: float
+    plan: PayDownPlan
+    evaluations: int
+    seconds: float
+
+
+class BudgetSolver:
+    """Solves targets for one plan config"""
+
+    def __init__(
+        self,
+        config: PlanConfig,
+        start: date = None,
+        max_months: int = MAX_MONTHS,
+        windfall_date: str = None,
+    ):
+        """
+            Without a windfall_date (mm/dd/yyyy) the monthly budget_savings
+            is searched, with one the config's own budget_savings is kept
+            and the size of an extra windfall in that month is searched
+        """
+        self.config = config
+        self.max_months = max_months
+        user = config.user if windfall_date else dict(config.user, budget_savings="0")
+        self.parsed = portfolio(config.loans, config.windfalls, user, start)
+        self.windfall_month = (
+            month_index(self.parsed.start, windfall_date) if windfall_date else None
+        )
+        self.plans: Dict[int, PayDownPlan] = {}
+
+    @classmethod
+    def from_json(cls, loaded_json: dict, **options) -> "BudgetSolver":
+        return cls(PlanConfig.from_json(loaded_json), **options)
+
+    def plan_for(self, cents: int) -> PayDownPlan:
+        """Plan with cents of budget savings (or windfall), memoized"""
+        if cents not in self.plans:
+            amount = cents / 100
+            if self.windfall_month is None:
+                parsed = self.parsed._replace(budget=self.parsed.budget + amount)
+            else:
+                windfalls = dict(self.parsed.windfalls)
+                windfalls[self.windfall_month] = (
+                    windfalls.get(self.windfall_month, 0.0) + amount
+                )
+                parsed = self.parsed._replace(windfalls=windfalls)
+            self.plans[cents] = simulate_portfolio(parsed, self.max_months)
+        return self.plans[cents]
+
+    @staticmethod
+    def meets(
+        plan: PayDownPlan,
+        debt_free_by: date = None,
+        max_interest: float = None,
+        after_tax: bool = False,
+    ) -> bool:
+        if not plan.paid_off:
+            return False
+        if debt_free_by and (plan.debt_free_date or plan.start) > debt_free_by:
+            return False
+        interest = plan.after_tax_interest if after_tax else plan.total_interest
+        return max_interest is None or interest <= max_interest
+
+    def solve(
+        self,
+        debt_free_by: date = None,
+        max_interest: float = None,
+        after_tax: bool = False,
+        resolution: int = 100,
+        max_amount: float = None,
+    ) -> Solution:
+        """
+            Smallest amount, a multiple of resolution cents, whose plan is
+            debt-free by debt_free_by with at most max_interest interest.
+            ValueError when no amount up to max_amount (by default the
+            total balance, enough to pay everything off at once) does it.
+        """
+        if debt_free_by is None and max_interest is None:
+            raise ValueError("Give a debt_free_by date, a max_interest or both")
+        started = time.perf_counter()
+        evaluations = len(self.plans)
+
+        def meets(steps: int) -> bool:
+            plan = self.plan_for(steps * resolution)
+            return self.meets(plan, debt_free_by, max_interest, after_tax)
+
+        if max_amount is None:
+            max_amount = sum(terms.balance for terms in self.parsed.terms)
+        limit = max(int(max_amount * 100) // resolution + 1, 1)
+        low, high = 0, 0
+        if not meets(0):
+            high = max(FIRST_GUESS_CENTS // resolution, 1)
+            while not meets(min(high, limit)):
+                if high >= limit:
+                    raise ValueError(
+                        f"Target not reachable with up to {max_amount:,.2f}"
+                    )
+                low, high = high, high * 2
+            high = min(high, limit)
+            while high - low > 1:
+                middle = (low + high) // 2
+                if meets(middle):
+                    high = middle
+                else:
+                    low = middle
+        cents = high * resolution
+        return Solution(
+            amount=cents / 100,
+            plan=self.plan_for(cents),
+            evaluations=len(self.plans) - evaluations,
+            seconds=time.perf_counter() - started,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("config", help="plan config json")
+    parser.add_argument(
+        "--debt-free-by", type=date.fromisoformat, default=None, help="yyyy-mm-dd"
+    )
+    parser.add_argument("--max-interest", type=float, default=None)
+    parser.add_argument(
+        "--after-tax", action="store_true", help="cap after-tax interest instead"
+    )
+    parser.add_argument(
+        "--windfall-date",
+        default=None,
+        help="solve for a one-time windfall in this month (mm/dd/yyyy) instead",
+    )
+    parser.add_argument(
+        "--resolution", type=int, default=100, help="step of the answer in cents"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        with open(args.config, "r") as loan_json:
+            solver = BudgetSolver.from_json(
+                json.load(loan_json), windfall_date=args.windfall_date
+            )
+        solution = solver.solve(
+            debt_free_by=args.debt_free_by,
+            max_interest=args.max_interest,
+            after_tax=args.after_tax,
+            resolution=args.resolution,
+        )
+    except ValueError as error:
+        raise SystemExit(f"{args.config}: {error}")
+    kind = "windfall" if args.windfall_date else "budget_savings per month"
+    LOG.info(
+        f"{kind}: {solution.amount:,.2f}, debt-free {solution.plan.debt_free_date} "
+        f"with {solution.plan.total_interest:,.2f} interest "
+        f"({solution.evaluations} plans in {solution.seconds * 1000:.1f}ms)"
+    )
@@ -0,0 +1,31 @@
+import json
+import os
+import sys
+from datetime import date
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the modules live at the top of the repo, not in a package
+sys.path.insert(0, ROOT)
+
+from models import PlanConfig  # noqa: E402
+
+
+@pytest.fixture
+def start() -> date:
+    """Plans start before the example config's promo and windfalls"""
+    return date(2018, 1, 1)
+
+
+@pytest.fixture
+def example() -> dict:
+    """plan_configs/example-plan-config.json, loaded fresh for every test"""
+    with open(os.path.join(ROOT, "plan_configs", "example-plan-config.json")) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def example_config(example) -> PlanConfig:
+    return PlanConfig.from_json(example)
@@ -0,0 +1,21 @@
+import copy
+
+import pytest
+
+from allocation import optimize
+from models import PlanConfig
+
+
+def without_tax(loaded_json: dict) -> dict:
+    untaxed = copy.deepcopy(loaded_json)
+    untaxed["user"]["tax_bracket"] = "0"
+    return untaxed
+
+
+@pytest.mark.parametrize("edit", [lambda config: config, without_tax])
+def test_never_worse_than_avalanche_or_snowball(example, start, edit):
+    allocation = optimize(PlanConfig.from_json(edit(example)), start)
+    assert allocation.plan.paid_off
+    assert allocation.plan.after_tax_interest <= allocation.avalanche.after_tax_interest
+    assert allocation.plan.after_tax_interest <= allocation.snowball.after_tax_interest
+    assert allocation.savings >= 0
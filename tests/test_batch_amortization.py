@@ -0,0 +1,53 @@
+import copy
+
+import pytest
+
+from amortization import simulate
+from batch_amortization import PortfolioBatch, simulate_batch
+from models import PlanConfig
+
+
+@pytest.fixture
+def configs(example) -> list:
+    """The example, two debts of it (padded in the batch) and two underfunded"""
+    fewer = copy.deepcopy(example)
+    fewer["loans"] = fewer["loans"][1:3]
+    short = copy.deepcopy(example)
+    short["user"]["budget_savings"] = "-150"
+    never = copy.deepcopy(example)
+    never["user"]["budget_savings"] = "-400"
+    return [example, fewer, short, never]
+
+
+@pytest.mark.parametrize("strategy", ["avalanche", "snowball"])
+def test_batch_matches_simulate(configs, start, strategy):
+    result = simulate_batch(
+        PortfolioBatch.from_configs(configs, start), strategy, max_months=240
+    )
+    for n, loaded_json in enumerate(configs):
+        config = PlanConfig.from_json(loaded_json)
+        plan = simulate(
+            config.loans,
+            config.windfalls,
+            config.user,
+            start,
+            strategy=strategy,
+            max_months=240,
+        )
+        debts = len(plan.outcomes)
+        assert [
+            month if month > 0 else None for month in result.payoff_months[n, :debts]
+        ] == [outcome.payoff_month for outcome in plan.outcomes]
+        assert result.interest[n, :debts] == pytest.approx(
+            [outcome.total_interest for outcome in plan.outcomes], abs=0.01
+        )
+
+
+def test_shortfall_pays_minimums_in_debt_order(configs, start):
+    """The underfunded portfolio doesn't change the others in its batch"""
+    together = simulate_batch(PortfolioBatch.from_configs(configs, start))
+    for n, loaded_json in enumerate(configs):
+        alone = simulate_batch(PortfolioBatch.from_configs([loaded_json], start))
+        debts = alone.payoff_months.shape[1]
+        assert (together.payoff_months[n, :debts] == alone.payoff_months[0]).all()
+        assert together.interest[n, :debts] == pytest.approx(alone.interest[0])
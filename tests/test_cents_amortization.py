@@ -0,0 +1,108 @@
+"""
+    Plans small enough to work out by hand, the expected payoff months and
+    interest below don't come from either engine
+"""
+import numpy as np
+import pytest
+
+from cents_amortization import (
+    CentsBatch,
+    monthly_interest,
+    reference_plan,
+    simulate_cents,
+)
+from models import PlanConfig
+
+
+INTRODUCTORY = "A low introductory interest rate that will increase at a later date"
+
+
+def loan(balance, rate, minimum, deductible="0", promo=None) -> dict:
+    return {
+        "lender_name": f"Loan {balance}",
+        "interest_rate": rate,
+        "balance": balance,
+        "min_monthly_payment": minimum,
+        "loan_type": "Other kind of loan",
+        "promo": promo,
+        "deductible": deductible,
+    }
+
+
+def config(loans, budget_savings="0", tax_bracket="0") -> dict:
+    return {
+        "loans": loans,
+        "windfalls": [],
+        "user": {
+            "tax_bracket": tax_bracket,
+            "budget_savings": budget_savings,
+            "raises": "0",
+        },
+    }
+
+
+# $10.50 at 12% earns 10.5 cents, which rounds half up to 11
+HALF_CENT = config([loan("10.50", "12", "100")])
+
+# 0% through February, then 1% a month on $800.00 and down:
+# 8.00 + 7.08 + 6.15 + 5.21 + 4.26 + 3.31 + 2.34 + 1.36 + 0.38
+PROMO_ENDING = config(
+    [
+        loan(
+            "1,000",
+            "12",
+            "100",
+            promo={
+                "regular_rate": "12",
+                "promo_rate": "0",
+                "end_date": "02/15/2018",
+                "minimum_monthly_payment": "100",
+                "promo_type": INTRODUCTORY,
+            },
+        )
+    ]
+)
+
+# a $150 budget against $200 of minimums: the first debt gets its $100,
+# the second the $50 left until the first is paid off in month 5, then
+# all $150; its interest is 5.00 + 4.55 + 4.10 + 3.64 + 3.17 + 2.70 + 1.23
+SHORTFALL = config(
+    [loan("500", "0", "100"), loan("500", "12", "100")], budget_savings="-50"
+)
+
+# at a 25% bracket a deductible 8% costs 6% like the other loan, the tie
+# goes to the smaller balance so the 6% loan gets the extra first
+# (month 2 also rounds its 176.5 cents of interest up)
+DEDUCTIBLE_TIE = config(
+    [loan("1,200", "8", "50", deductible="1"), loan("600", "6", "50")],
+    budget_savings="200",
+    tax_bracket="25",
+)
+
+EXPECTED = [
+    (HALF_CENT, [1], [11]),
+    (PROMO_ENDING, [11], [3809]),
+    (SHORTFALL, [5, 7], [0, 2439]),
+    (DEDUCTIBLE_TIE, [7, 3], [3611, 529]),
+]
+
+
+def test_monthly_interest_rounds_half_up():
+    balances = np.array([1049, 1050, 1150, 35300], dtype=np.int64)
+    rates = np.array([1200, 1200, 1200, 600], dtype=np.int64)
+    assert monthly_interest(balances, rates).tolist() == [10, 11, 12, 177]
+
+
+@pytest.mark.parametrize("loaded_json, payoffs, interest", EXPECTED)
+def test_simulate_cents_by_hand(loaded_json, payoffs, interest, start):
+    result = simulate_cents(CentsBatch.from_configs([loaded_json], start))
+    assert result.payoff_months[0].tolist() == payoffs
+    assert result.interest[0].tolist() == interest
+
+
+@pytest.mark.parametrize("loaded_json, payoffs, interest", EXPECTED)
+def test_reference_plan_by_hand(loaded_json, payoffs, interest, start):
+    assert reference_plan(PlanConfig.from_json(loaded_json), start) == (
+        payoffs,
+        interest,
+    )
@@ -0,0 +1,119 @@
+import threading
+
+import pytest
+
+pytest.importorskip("wrapped_driver")
+
+import driver_pool  # noqa: E402
+from driver_pool import DriverPool  # noqa: E402
+
+
+class FakeDriver:
+    def __init__(self):
+        self.driver = self
+        self.current_url = "about:blank"
+        self.quit = False
+
+    def quit_driver(self):
+        self.quit = True
+
+
+class FakeCalculator:
+    def __init__(self, webdriver):
+        self.webdriver = webdriver
+
+    def open_calculator(self):
+        pass
+
+    def start_over(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def calculator(monkeypatch):
+    monkeypatch.setattr(driver_pool, "Calculator", FakeCalculator)
+
+
+def lease_in_thread(pool: DriverPool) -> threading.Thread:
+    def lease():
+        with pool.lease():
+            pass
+
+    thread = threading.Thread(target=lease, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_waiter_gets_a_new_driver_when_a_plan_breaks_one():
+    pool = DriverPool(1, driver_factory=FakeDriver)
+    with pytest.raises(RuntimeError):
+        with pool.lease() as broken:
+            waiter = lease_in_thread(pool)
+            waiter.join(0.1)
+            assert waiter.is_alive()
+            raise RuntimeError("plan failed")
+    waiter.join(5)
+    assert not waiter.is_alive()
+    assert broken.quit
+    assert pool.created == 1
+
+
+def test_waiter_is_woken_when_a_driver_fails_to_start():
+    started = threading.Event()
+    release = threading.Event()
+
+    def factory():
+        if not started.is_set():
+            started.set()
+            release.wait(5)
+            raise RuntimeError("chrome did not start")
+        return FakeDriver()
+
+    pool = DriverPool(1, driver_factory=factory)
+    failing = threading.Thread(target=lambda: pytest.raises(RuntimeError, pool._take))
+    failing.start()
+    started.wait(5)
+    waiter = lease_in_thread(pool)
+    waiter.join(0.1)
+    assert waiter.is_alive()
+    release.set()
+    failing.join(5)
+    waiter.join(5)
+    assert not waiter.is_alive()
+    assert pool.created == 1
+
+
+def test_drivers_are_reused_and_recycled():
+    pool = DriverPool(1, driver_factory=FakeDriver, max_uses=2)
+    drivers = []
+    for _ in range(3):
+        with pool.lease() as driver:
+            drivers.append(driver)
+    assert drivers[0] is drivers[1] is not drivers[2]
+    assert drivers[0].quit
+    pool.close()
+    assert drivers[2].quit and pool.created == 0
+
+
+def test_driver_returned_after_close_is_quit():
+    pool = DriverPool(2, driver_factory=FakeDriver)
+    with pool.lease() as leased:
+        with pool.lease() as idle:
+            pass
+        pool.close()
+        assert idle.quit and not leased.quit
+    assert leased.quit
+    assert pool.created == 0 and not pool.idle
+    with pytest.raises(RuntimeError):
+        with pool.lease():
+            pass
+
+
+def test_quit_idle_keeps_the_pool_open():
+    pool = DriverPool(1, driver_factory=FakeDriver)
+    with pool.lease() as first:
+        pass
+    pool.quit_idle()
+    with pool.lease() as second:
+        pass
+    assert first.quit and second is not first and not second.quit
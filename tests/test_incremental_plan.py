@@ -0,0 +1,41 @@
+import copy
+
+from amortization import IncrementalPlan, portfolio, simulate
+from models import PlanConfig
+
+
+def fresh_plan(loaded_json: dict, start):
+    config = PlanConfig.from_json(loaded_json)
+    return simulate(config.loans, config.windfalls, config.user, start)
+
+
+def incremental_plan(loaded_json: dict, start) -> IncrementalPlan:
+    config = PlanConfig.from_json(loaded_json)
+    return IncrementalPlan(
+        portfolio(config.loans, config.windfalls, config.user, start)
+    )
+
+
+def test_unedited_plan_matches_simulate(example, start):
+    plan = incremental_plan(example, start).plan
+    assert plan.to_dict() == fresh_plan(example, start).to_dict()
+
+
+def test_min_payment_amendment_matches_edited_config(example, start):
+    edited = copy.deepcopy(example)
+    edited["loans"][0]["min_monthly_payment"] = "150"
+
+    plan = incremental_plan(example, start)
+    plan.amend(0, 1, min_payment=150.0)
+
+    assert plan.recalculate().to_dict() == fresh_plan(edited, start).to_dict()
+
+
+def test_budget_savings_edit_matches_edited_config(example, start):
+    edited = copy.deepcopy(example)
+    edited["user"]["budget_savings"] = "300"
+
+    plan = incremental_plan(example, start)
+    plan.set_budget_savings(300.0)
+
+    assert plan.recalculate().to_dict() == fresh_plan(edited, start).to_dict()
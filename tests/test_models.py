@@ -0,0 +1,19 @@
+import copy
+
+from models import config_hash
+
+
+def test_hash_ignores_formatting_and_key_order(example):
+    reformatted = copy.deepcopy(example)
+    reformatted["loans"][2]["balance"] = "4000"
+    reformatted["loans"][0]["balance"] = "$3018.36"
+    reformatted["windfalls"][0]["date"] = "4/11/2018"
+    reformatted["user"] = dict(reversed(list(reformatted["user"].items())))
+    reformatted["loans"][1] = dict(sorted(reformatted["loans"][1].items()))
+    assert config_hash(reformatted) == config_hash(example)
+
+
+def test_hash_changes_with_the_plan(example):
+    changed = copy.deepcopy(example)
+    changed["loans"][2]["balance"] = "4,000.01"
+    assert config_hash(changed) != config_hash(example)
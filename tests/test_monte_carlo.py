@@ -0,0 +1,38 @@
+import numpy as np
+
+from monte_carlo import Uncertainty, run
+
+
+UNCERTAINTY = Uncertainty(
+    windfall_probability=0.7,
+    windfall_sd=0.3,
+    windfall_delay=3,
+    raises=1,
+    raise_amount=50.0,
+    raise_sd=20.0,
+)
+
+
+def test_results_do_not_depend_on_the_worker_count(example, start):
+    runs = [
+        run(
+            example,
+            UNCERTAINTY,
+            300,
+            seed=7,
+            workers=workers,
+            chunk_size=100,
+            start=start,
+        )
+        for workers in (1, 2, 3)
+    ]
+    for other in runs[1:]:
+        assert np.array_equal(other.debt_free_months, runs[0].debt_free_months)
+        assert np.array_equal(other.total_interest, runs[0].total_interest)
+        assert other.percentiles() == runs[0].percentiles()
+
+
+def test_seed_changes_the_trials(example, start):
+    first = run(example, UNCERTAINTY, 200, seed=1, workers=1, start=start)
+    second = run(example, UNCERTAINTY, 200, seed=2, workers=1, start=start)
+    assert not np.array_equal(first.total_interest, second.total_interest)
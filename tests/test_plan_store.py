@@ -0,0 +1,34 @@
+from datetime import date
+
+from plan_parser import DebtPayoff, ParsedPlan
+from plan_store import PlanStore
+
+
+def plan(*debts: DebtPayoff) -> ParsedPlan:
+    return ParsedPlan("example", list(debts), [])
+
+
+PAID = DebtPayoff("example", "Card", date(2021, 4, 1), 40, 512.25)
+UNPAID = DebtPayoff("example", "Loan", None, None, None)
+
+
+def test_debt_free_when_every_debt_is_paid_off():
+    paid = plan(PAID, DebtPayoff("example", "Loan", date(2021, 3, 1), 39, 100.0))
+    assert paid.debt_free_date == date(2021, 4, 1)
+    assert paid.months == 40
+
+
+def test_not_debt_free_when_a_debt_has_no_payoff():
+    unpaid = plan(PAID, UNPAID)
+    assert unpaid.debt_free_date is None
+    assert unpaid.months is None
+
+
+def test_store_keeps_null_when_a_debt_has_no_payoff():
+    store = PlanStore(":memory:")
+    plan_id = store.add(plan(PAID, UNPAID))
+    row = store.connection.execute(
+        "SELECT debt_free_date, months FROM plans WHERE id = ?", (plan_id,)
+    ).fetchone()
+    assert tuple(row) == (None, None)
+    store.close()
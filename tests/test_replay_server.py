@@ -0,0 +1,82 @@
+import json
+import re
+from types import SimpleNamespace
+
+import requests
+
+from replay_server import ReplayServer, SessionRecorder
+from view_state import VIEW_STATE
+
+
+STEP = {"ctl00$well$defaultUC$isValid": "is_change_loan_details"}
+GET_PLAN = {"ctl00$well$defaultUC$isValid": "isValid", "SubmitNOMTP": "Get Plan"}
+
+
+def page(view_state: str, text: str) -> str:
+    return (
+        f'<html><body><input type="hidden" name="{VIEW_STATE}" '
+        f'id="{VIEW_STATE}" value="{view_state}" /><p>{text}</p></body></html>'
+    )
+
+
+def record(path, conversation) -> str:
+    """conversation is (posted fields, view state served, text) per post"""
+    recorder = SessionRecorder()
+    view_state = "initial-state"
+    response = SimpleNamespace(status_code=200, text=page(view_state, "start"))
+    recorder.record("GET", None, response, view_state)
+    for fields, served, text in conversation:
+        params = dict(fields, **{VIEW_STATE: view_state})
+        response = SimpleNamespace(status_code=200, text=page(served, text))
+        recorder.record("POST", params, response, served)
+        view_state = served
+    recorder.save(str(path))
+    return str(path)
+
+
+def replay(url: str, posts) -> list:
+    text = requests.get(url).text
+    texts = []
+    for fields in posts:
+        view_state = re.search(r'value="([^"]*)"', text).group(1)
+        text = requests.post(url, data=dict(fields, **{VIEW_STATE: view_state})).text
+        texts.append(re.search(r"<p>(.*)</p>", text).group(1))
+    return texts
+
+
+def test_repeated_steps_and_plans_replay_their_own_pages(tmp_path):
+    first = record(
+        tmp_path / "first.json",
+        [
+            (STEP, "first-loan-state", "first loan"),
+            (STEP, "second-loan-state", "second loan"),
+            (GET_PLAN, "plan-one-state", "plan one"),
+        ],
+    )
+    second = record(
+        tmp_path / "second.json",
+        [
+            (dict(STEP, balance="4000"), "other-state", "other loan"),
+            (GET_PLAN, "plan-two-state", "plan two"),
+        ],
+    )
+    with ReplayServer([first, second]) as server:
+        assert replay(server.url, [STEP, STEP, GET_PLAN]) == [
+            "first loan",
+            "second loan",
+            "plan one",
+        ]
+        assert replay(server.url, [dict(STEP, balance="4000"), GET_PLAN]) == [
+            "other loan",
+            "plan two",
+        ]
+
+
+def test_recorded_view_states_are_swapped_for_keys(tmp_path):
+    path = record(tmp_path / "plan.json", [(STEP, "loan-state", "loan")])
+    with open(path, "r") as fixture:
+        exchanges = json.load(fixture)["exchanges"]
+    with ReplayServer([path]) as server:
+        body = requests.get(server.url).text
+    assert "initial-state" not in body
+    assert exchanges[0]["key"] in body
@@ -0,0 +1,38 @@
+import time
+
+from scheduler import Scheduler
+
+
+URL = "http://127.0.0.1:8000/"
+
+
+def acquire_seconds(scheduler: Scheduler) -> float:
+    started = time.monotonic()
+    scheduler.acquire(URL)
+    return time.monotonic() - started
+
+
+def test_throttled_host_backs_off_without_a_rate():
+    scheduler = Scheduler(float("inf"), max_conversations=2, backoff=0.05)
+    assert acquire_seconds(scheduler) < 0.02
+
+    scheduler.report(URL, 503)
+    assert acquire_seconds(scheduler) >= 0.04
+    scheduler.report(URL, 429)
+    assert acquire_seconds(scheduler) >= 0.09
+
+    scheduler.report(URL, 200)
+    assert acquire_seconds(scheduler) < 0.02
+    scheduler.report(URL, 503)
+    assert 0.04 <= acquire_seconds(scheduler) < 0.09
+
+
+def test_backoff_is_capped_and_retry_after_wins():
+    scheduler = Scheduler(float("inf"), backoff=0.05, max_backoff=0.1)
+    for _ in range(5):
+        scheduler.report(URL, None)
+        scheduler.acquire(URL)
+    assert scheduler.hosts["127.0.0.1:8000"].backoff == 0.1
+
+    scheduler.report(URL, 429, retry_after=0.2)
+    assert acquire_seconds(scheduler) >= 0.19
@@ -0,0 +1,35 @@
+import pytest
+
+from allocation import PriorityPolicy
+from amortization import portfolio, simulate, simulate_portfolio, snowball
+
+
+def outcome(plan) -> dict:
+    """The plan without its schedule, which the event engine keeps per event"""
+    return {k: v for k, v in plan.to_dict().items() if k != "schedule"}
+
+
+@pytest.fixture
+def parsed(example_config, start):
+    config = example_config
+    return portfolio(config.loans, config.windfalls, config.user, start)
+
+
+def test_avalanche_matches_month_stepping(example_config, parsed, start):
+    config = example_config
+    plan = simulate(config.loans, config.windfalls, config.user, start)
+    assert outcome(simulate_portfolio(parsed)) == outcome(plan)
+
+
+def test_priority_policy_matches_month_stepping(example_config, parsed, start):
+    config = example_config
+    order = tuple(reversed(range(len(parsed.terms))))
+    policy = PriorityPolicy((1,), (order,))
+    plan = simulate(config.loans, config.windfalls, config.user, start, strategy=policy)
+    assert outcome(simulate_portfolio(parsed, strategy=policy)) == outcome(plan)
+
+
+@pytest.mark.parametrize("strategy", [snowball, "snowball", lambda *args: [0, 1]])
+def test_rejects_strategies_ordered_by_balance(parsed, strategy):
+    with pytest.raises(ValueError):
+        simulate_portfolio(parsed, strategy=strategy)
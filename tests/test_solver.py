@@ -0,0 +1,37 @@
+from datetime import date
+
+import pytest
+
+from solver import BudgetSolver
+
+
+DEBT_FREE_BY = date(2020, 1, 1)
+
+
+@pytest.fixture
+def solver(example, start) -> BudgetSolver:
+    return BudgetSolver.from_json(example, start=start)
+
+
+def test_finds_the_smallest_budget_savings(solver):
+    solution = solver.solve(debt_free_by=DEBT_FREE_BY)
+    cents = round(solution.amount * 100)
+    assert solution.plan.debt_free_date <= DEBT_FREE_BY
+    assert solver.plan_for(cents - 100).debt_free_date > DEBT_FREE_BY
+    # doubling then bisecting, not a scan over every dollar
+    assert solution.evaluations <= 2 * (cents // 100).bit_length() + 2
+
+
+def test_smallest_windfall_meets_an_interest_cap(example, start):
+    solver = BudgetSolver.from_json(example, start=start, windfall_date="02/01/2018")
+    solution = solver.solve(max_interest=3000.0)
+    cents = round(solution.amount * 100)
+    assert solution.plan.total_interest <= 3000.0
+    assert solver.plan_for(cents - 100).total_interest > 3000.0
+
+
+def test_unreachable_target_is_a_value_error(solver, start):
+    with pytest.raises(ValueError, match="not reachable"):
+        solver.solve(debt_free_by=date(start.year - 1, 1, 1))
+    with pytest.raises(ValueError):
+        solver.solve()
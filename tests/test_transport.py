@@ -0,0 +1,80 @@
+import pytest
+import requests
+
+import transport
+from transport import Transport
+from view_state import VIEW_STATE
+
+
+URL = "http://127.0.0.1:8000/"
+
+
+def response(status: int, retry_after: str = None) -> requests.Response:
+    sent = requests.Response()
+    sent.status_code = status
+    if retry_after:
+        sent.headers["Retry-After"] = retry_after
+    return sent
+
+
+class FakeSession:
+    """Hands out the queued outcomes, an exception instance is raised"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, data=None, headers=None, timeout=None):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def waits(monkeypatch) -> list:
+    slept = []
+    monkeypatch.setattr(transport.time, "sleep", slept.append)
+    return slept
+
+
+def test_get_is_retried_with_growing_backoff(waits):
+    session = FakeSession(response(503), response(502), response(200))
+    sent, retries = Transport(backoff=1.0).request(session, "GET", URL)
+    assert (sent.status_code, retries) == (200, 2)
+    assert 0.5 <= waits[0] <= 1.0 and 1.0 <= waits[1] <= 2.0
+
+
+def test_retry_after_is_honoured_up_to_max_backoff(waits):
+    session = FakeSession(response(429, "3"), response(429, "60"), response(200))
+    Transport(max_backoff=8.0).request(session, "GET", URL)
+    assert waits == [3.0, 8.0]
+
+
+def test_last_retryable_status_is_returned(waits):
+    session = FakeSession(*[response(503)] * 3)
+    sent, retries = Transport(retries=2).request(session, "GET", URL)
+    assert (sent.status_code, retries, session.calls) == (503, 2, 3)
+
+
+def test_post_with_view_state_is_retried(waits):
+    session = FakeSession(requests.ReadTimeout(), response(200))
+    _, retries = Transport().request(session, "POST", URL, data={VIEW_STATE: "x"})
+    assert retries == 1
+
+
+def test_post_without_view_state_is_not_replayed(waits):
+    session = FakeSession(response(503), response(200))
+    sent, retries = Transport().request(session, "POST", URL, data={"a": "1"})
+    assert (sent.status_code, retries) == (503, 0)
+    with pytest.raises(requests.ReadTimeout):
+        Transport().request(
+            FakeSession(requests.ReadTimeout()), "POST", URL, data={"a": "1"}
+        )
+
+
+def test_connect_timeout_is_always_retried(waits):
+    session = FakeSession(requests.ConnectTimeout(), response(200))
+    _, retries = Transport().request(session, "POST", URL, data={"a": "1"})
+    assert retries == 1
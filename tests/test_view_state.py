@@ -0,0 +1,34 @@
+from view_state import EVENT_VALIDATION, VIEW_STATE, scan_hidden_fields
+
+
+PAGE = (
+    b"<html><body>" + b"x" * 100 + b'<input type="hidden" name="__VIEWSTATE" '
+    b'id="__VIEWSTATE" value="dDwt&amp;MTA=" />'
+    b'<input type="hidden" id="__EVENTVALIDATION" value="ev+1/2=" />'
+    b"<p>rest of the page</p></body></html>"
+)
+
+
+def chunked(page: bytes, size: int):
+    for start in range(0, len(page), size):
+        yield page[start : start + size]
+
+
+def test_fields_split_across_chunks():
+    expected = {VIEW_STATE: "dDwt&MTA=", EVENT_VALIDATION: "ev+1/2="}
+    for size in (1, 7, 13, 64, len(PAGE)):
+        found = scan_hidden_fields(chunked(PAGE, size), (VIEW_STATE, EVENT_VALIDATION))
+        assert found == expected, size
+
+
+def test_stops_reading_once_every_field_is_found():
+    def chunks():
+        yield from chunked(PAGE[: PAGE.index(b"<p>")], 16)
+        raise AssertionError("read past the hidden fields")
+
+    found = scan_hidden_fields(chunks(), (VIEW_STATE, EVENT_VALIDATION))
+    assert set(found) == {VIEW_STATE, EVENT_VALIDATION}
+
+
+def test_missing_field_is_left_out():
+    assert scan_hidden_fields(chunked(PAGE, 10), ("__VIEWSTATEGENERATOR",)) == {}
@@ -0,0 +1,72 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from debt_pay_down_calculator import DebtCalculatorClient
+from view_state_cache import CachedStep, ViewStateCache
+
+
+PARAMS = {"ctl00$MainContent$txtNumberOfDebts": 2}
+
+
+def test_keys_depend_on_url():
+    live = ViewStateCache.step_key(DebtCalculatorClient.url, None, PARAMS)
+    replay = ViewStateCache.step_key("http://127.0.0.1:8000/", None, PARAMS)
+    assert live != replay
+
+
+def test_round_trips_both_hidden_fields(tmp_path):
+    cache = ViewStateCache(str(tmp_path))
+    key = ViewStateCache.step_key("http://127.0.0.1:8000/", None, PARAMS)
+    cache.set(key, "state", "validation")
+    assert cache.get(key) == CachedStep("state", "validation")
+
+
+def test_entries_without_event_validation_are_misses(tmp_path):
+    cache = ViewStateCache(str(tmp_path))
+    (tmp_path / "old.json").write_text('{"created": 1e12, "view_state": "state"}')
+    assert cache.get("old") is None
+    assert not (tmp_path / "old.json").exists()
+
+
+def test_threads_writing_one_key_share_no_temp_file(tmp_path):
+    cache = ViewStateCache(str(tmp_path))
+    key = ViewStateCache.step_key(DebtCalculatorClient.url, None, PARAMS)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        writes = [
+            executor.submit(cache.set, key, "state", "validation") for _ in range(200)
+        ]
+    for write in writes:
+        write.result()
+
+    assert cache.get(key) == CachedStep("state", "validation")
+    assert os.listdir(tmp_path) == [f"{key}.json"]
+
+
+def test_failed_write_is_a_miss(tmp_path):
+    cache = ViewStateCache(str(tmp_path / "gone"))
+    os.rmdir(tmp_path / "gone")
+    cache.set("key", "state", "validation")
+    assert cache.get("key") is None
+
+
+def test_expiry_counts_from_the_write_not_the_last_use(tmp_path):
+    cache = ViewStateCache(str(tmp_path), ttl=60)
+    cache.set("key", "state", "validation")
+    path = tmp_path / "key.json"
+    written = time.time() - 120
+    os.utime(path, (written, written))
+    assert cache.get("key") is None
+    assert not path.exists()
+
+
+def test_evicts_least_recently_used_past_max_bytes(tmp_path):
+    cache = ViewStateCache(str(tmp_path), max_bytes=300, evict_every=1000)
+    for n in range(3):
+        cache.set(f"key{n}", "x" * 50, None)
+        used = time.time() - 100 + n
+        os.utime(tmp_path / f"key{n}.json", (used, used))
+    cache.get("key0")
+    # four entries of 94 bytes go past max_bytes, key1 is the least used
+    cache.set("key3", "x" * 50, None)
+    assert sorted(os.listdir(tmp_path)) == ["key0.json", "key2.json", "key3.json"]
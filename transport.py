@@ -0,0 +1,160 @@
+"""
+    HTTP transport shared by DebtCalculatorClients. One keep-alive
+    connection pool (an HTTPAdapter) is mounted on every client's session,
+    sessions stay separate so each conversation keeps its own cookies.
+    Requests get connect/read timeouts and are retried with exponential
+    backoff when it is safe: GETs, connections that never reached the
+    server and wizard POSTs, which carry their __VIEWSTATE and so replay
+    the last good state. br is only advertised when it can be decoded.
+"""
+import importlib.util
+import logging
+import random
+import threading
+import time
+from typing import Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from view_state import VIEW_STATE
+
+
+LOG = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+ACCEPT_ENCODING = (
+    "gzip, deflate, br"
+    if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi")
+    else "gzip, deflate"
+)
+
+
+class Transport:
+    def __init__(
+        self,
+        pool_connections: int = 10,
+        pool_maxsize: int = 32,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 8.0,
+    ):
+        """
+            pool_maxsize connections are kept alive per host, retries is
+            the number of attempts after the first and the wait before
+            attempt n is backoff * 2 ** n seconds with jitter, capped at
+            max_backoff or the server's Retry-After
+        """
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=0,
+            pool_block=True,
+        )
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def session(self) -> requests.Session:
+        """A session with its own cookies on the shared connection pool"""
+        session = requests.Session()
+        session.mount("https://", self.adapter)
+        session.mount("http://", self.adapter)
+        session.headers["connection"] = "keep-alive"
+        return session
+
+    @staticmethod
+    def replayable(method: str, data: Optional[dict]) -> bool:
+        return method == "GET" or bool(data and data.get(VIEW_STATE))
+
+    def _wait(self, attempt: int, response: requests.Response = None) -> float:
+        delay = retry_after(response)
+        if delay is not None:
+            return min(delay, self.max_backoff)
+        return min(self.backoff * 2 ** attempt, self.max_backoff) * random.uniform(
+            0.5, 1
+        )
+
+    def _send(self, session, method, url, data, headers, rate_limiter):
+        if rate_limiter:
+            rate_limiter.acquire(url)
+        try:
+            response = session.request(
+                method, url, data=data, headers=headers, timeout=self.timeout
+            )
+        except requests.RequestException:
+            if rate_limiter:
+                rate_limiter.report(url, None)
+            raise
+        if rate_limiter:
+            rate_limiter.report(url, response.status_code, retry_after(response))
+        return response
+
+    def request(
+        self,
+        session: requests.Session,
+        method: str,
+        url: str,
+        data: dict = None,
+        headers: dict = None,
+        rate_limiter=None,
+    ) -> Tuple[requests.Response, int]:
+        """
+            Send with timeouts and retries, returns the response and how
+            many retries it took. Retryable statuses are returned as is once
+            the retries run out, connection errors are raised. Every attempt
+            waits for rate_limiter.acquire(url) and is reported back with
+            rate_limiter.report(url, status, retry_after), see scheduler.
+        """
+        replayable = self.replayable(method, data)
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                response = self._send(session, method, url, data, headers, rate_limiter)
+            except requests.ConnectionError as error:
+                # a failed connect never reached the server, always safe
+                safe = replayable or isinstance(error, requests.ConnectTimeout)
+                if last_attempt or not safe:
+                    raise
+                wait = self._wait(attempt)
+                LOG.warning(f"{method} {url} failed ({error!r}), retry in {wait:.1f}s")
+            except requests.Timeout:
+                if last_attempt or not replayable:
+                    raise
+                wait = self._wait(attempt)
+                LOG.warning(f"{method} {url} timed out, retry in {wait:.1f}s")
+            else:
+                if (
+                    response.status_code not in RETRY_STATUSES
+                    or last_attempt
+                    or not replayable
+                ):
+                    return response, attempt
+                wait = self._wait(attempt, response)
+                LOG.warning(
+                    f"{method} {url} returned {response.status_code}, "
+                    f"retry in {wait:.1f}s"
+                )
+            time.sleep(wait)
+
+
+def retry_after(response: Optional[requests.Response]) -> Optional[float]:
+    """Seconds asked for by a Retry-After header, dates are ignored"""
+    value = response.headers.get("retry-after") if response is not None else None
+    return float(value) if value and value.isdigit() else None
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_transport() -> Transport:
+    """Transport shared by every client not given one"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Transport()
+        return _default
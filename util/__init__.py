@@ -30,3 +30,34 @@ def send_keys_recursive(element: WebElement, value: str):
         assert element_value == value
     except AssertionError:
         send_keys_recursive(element=element, value=value)
+
+
+SET_VALUE_SCRIPT = """
+var element = arguments[0];
+var prototype = Object.getPrototypeOf(element);
+Object.getOwnPropertyDescriptor(prototype, "value").set.call(element, arguments[1]);
+element.dispatchEvent(new Event("input", {bubbles: true}));
+element.dispatchEvent(new Event("change", {bubbles: true}));
+return element.value;
+"""
+
+
+def send_keys_fast(element: WebElement, value: str, retries: int = 3, chunk: int = 8):
+    """
+        Set the input value with a single script call, firing the input
+        and change events Vue listens for, and verify it once. If the
+        value didn't stick fall back to clearing and typing it in chunks,
+        at most retries times.
+    """
+    value = str(value)
+    if element.parent.execute_script(SET_VALUE_SCRIPT, element, value) == value:
+        return
+    for _ in range(retries):
+        element.clear()
+        for start in range(0, len(value), chunk):
+            element.send_keys(value[start : start + chunk])
+        if element.get_attribute("value") == value:
+            return
+    raise Exception(
+        f"Input shows {element.get_attribute('value')!r} instead of {value!r}."
+    )
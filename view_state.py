@@ -0,0 +1,78 @@
+"""
+    Fast extraction of the ASP.NET hidden fields from calculator responses.
+    Instead of building a BeautifulSoup tree of the whole page the response
+    bytes are scanned chunk by chunk for <input> tags and the scan stops as
+    soon as the wanted fields are found. The full parser is only used as a
+    fallback and at most once per response.
+"""
+import html
+import re
+import weakref
+from typing import Dict, Iterable
+
+import requests
+from bs4 import BeautifulSoup
+
+
+VIEW_STATE = "__VIEWSTATE"
+EVENT_VALIDATION = "__EVENTVALIDATION"
+CHUNK_SIZE = 64 * 1024
+
+INPUT_TAG = re.compile(rb"<input\b[^>]*>", re.IGNORECASE)
+ATTRIBUTE = re.compile(rb"""([\w:.-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+
+_parsed_pages = weakref.WeakKeyDictionary()
+
+
+def scan_hidden_fields(chunks: Iterable[bytes], names: Iterable[str]) -> Dict[str, str]:
+    """
+        Value of every input in names (matched on id, then name) found in
+        the byte chunks, stops reading once all of them are found
+    """
+    wanted = {name.encode() for name in names}
+    found = {}
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        end = 0
+        for tag in INPUT_TAG.finditer(buffer):
+            end = tag.end()
+            attributes = {
+                key.lower(): double or single
+                for key, double, single in ATTRIBUTE.findall(tag.group(0))
+            }
+            field = attributes.get(b"id") or attributes.get(b"name")
+            if field in wanted:
+                value = attributes.get(b"value", b"").decode("utf-8", "replace")
+                found[field.decode()] = html.unescape(value)
+                if len(found) == len(wanted):
+                    return found
+        tail = buffer.rfind(b"<", end)
+        buffer = buffer[tail:] if tail != -1 else b""
+    return found
+
+
+def parsed_page(page_response: requests.Response) -> BeautifulSoup:
+    """The one full parse of a response, shared by everything that needs it"""
+    soup = _parsed_pages.get(page_response)
+    if soup is None:
+        soup = BeautifulSoup(page_response.content, "html.parser")
+        _parsed_pages[page_response] = soup
+    return soup
+
+
+def hidden_fields(
+    page_response: requests.Response, names: Iterable[str] = (VIEW_STATE,)
+) -> Dict[str, str]:
+    """
+        Scan the response for the hidden fields, __VIEWSTATE missing from
+        the scan (odd markup) is looked up with the full parser instead
+    """
+    names = tuple(names)
+    found = scan_hidden_fields(page_response.iter_content(CHUNK_SIZE), names)
+    if VIEW_STATE in names and VIEW_STATE not in found:
+        for name in names:
+            element = parsed_page(page_response).select_one(f"input#{name}")
+            if element is not None:
+                found[name] = element.attrs.get("value")
+    return found
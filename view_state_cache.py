@@ -0,0 +1,150 @@
+"""
+    On-disk cache of the calculator's __VIEWSTATE and __EVENTVALIDATION.
+    Both hidden fields after a step only depend on the calculator and the
+    inputs posted so far, so they are stored under a hash of the url
+    chained over every step's params. A run looks the chain up step by
+    step and only starts posting at the first step that isn't cached.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import NamedTuple, Optional
+
+
+LOG = logging.getLogger(__name__)
+
+
+class CachedStep(NamedTuple):
+    view_state: str
+    event_validation: Optional[str]
+
+
+class ViewStateCache:
+    """
+        Hidden fields stored one file per key. A file's mtime is when it
+        was written and its atime when it was last used: entries expire
+        ttl seconds after they were written, least recently used ones are
+        dropped once the directory grows past max_bytes. The directory is
+        only scanned every evict_every writes or when the size written
+        since the last scan could take it past max_bytes.
+    """
+
+    def __init__(
+        self,
+        directory: str = ".view_state_cache",
+        max_bytes: int = 50 * 1024 * 1024,
+        ttl: float = 7 * 24 * 60 * 60,
+        evict_every: int = 100,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evict_every = evict_every
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.size = None
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def step_key(url: str, previous_key: Optional[str], params: dict) -> str:
+        """
+            Key for a step of the calculator at url given the key of every
+            step before it
+        """
+        digest = hashlib.sha256(url.encode())
+        digest.update((previous_key or "").encode())
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[CachedStep]:
+        path = self._path(key)
+        try:
+            written = os.stat(path).st_mtime
+            if time.time() - written > self.ttl:
+                self._remove(path)
+                return None
+            with open(path, "r") as entry:
+                cached = json.load(entry)
+        except (OSError, ValueError):
+            return None
+        if not cached.get("view_state") or "event_validation" not in cached:
+            # written before event validation was cached, can't be replayed
+            self._remove(path)
+            return None
+        try:
+            # mark it used, keeping when it was written
+            os.utime(path, (time.time(), written))
+        except OSError:
+            pass
+        return CachedStep(cached["view_state"], cached["event_validation"])
+
+    def set(self, key: str, view_state: str, event_validation: Optional[str]):
+        """Store a step, a write that fails is logged and the step stays a miss"""
+        entry = json.dumps(
+            {"view_state": view_state, "event_validation": event_validation}
+        )
+        temp_path = None
+        try:
+            # threads of a batch share the pid, every write gets its own file
+            handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(handle, "w") as temp_file:
+                temp_file.write(entry)
+            os.replace(temp_path, self._path(key))
+        except OSError as error:
+            LOG.warning(f"View state not cached for {key}: {error}")
+            if temp_path:
+                self._remove(temp_path)
+            return
+        with self.lock:
+            self.writes += 1
+            if self.size is not None:
+                self.size += len(entry)
+            due = (
+                self.size is None
+                or self.size > self.max_bytes
+                or self.writes >= self.evict_every
+            )
+            if due:
+                self.writes = 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used until under max_bytes"""
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.ttl:
+                self._remove(path)
+            else:
+                entries.append((stat.st_atime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+        with self.lock:
+            self.size = total
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass